@@ -10,9 +10,15 @@ Applies a variety of color classification and identification methods to our data
 """
 
 
+import os
+import hashlib
+import warnings
+import functools
 import webcolors
-import math
+import numpy as np
 import pandas as pd
+from scipy.spatial import cKDTree
+from scale_data import DEFAULT_CACHE_DIR, SHEET_INDEX_COLUMNS, get_group_index, take_rows, with_columns
 
 # The Default Colors that we expect in our DataSet
 DEFAULT_COLORS = [
@@ -33,6 +39,54 @@ DEFAULT_COLORS = [
 ]
 
 
+# The CSS3 color library compiled once into a matrix of RGB values, one row per color name
+CSS3_NAMES = np.array(list(webcolors.CSS3_HEX_TO_NAMES.values()), dtype=object)
+CSS3_RGB = np.array([tuple(webcolors.hex_to_rgb(h))
+                    for h in webcolors.CSS3_HEX_TO_NAMES], dtype=np.int32)
+
+# How many colors to compare against the palette at once, keeps the distance matrix small
+CLASSIFY_CHUNK_SIZE = 4096
+
+
+def closest_colours(requested_colours, chunk_size=CLASSIFY_CHUNK_SIZE):
+    """Returns the Closest CSS3 Color of every RGB input at once
+
+        When two colors are equally close the one listed last by webcolors is chosen, 
+        which is what picking from a dictionary keyed by distance used to do.
+
+        Inputs:
+            (Array-Like of shape (n, 3)) - 'requested_colours': The RGB values of the colors i.e [(0,0,0),(255,255,255)]
+            (Int) - 'chunk_size' : How many colors to compare against the palette at once
+        Outputs:
+            (numpy.ndarray of Strings) - The Closest definable color of every input as per the CSS3 color library
+    """
+    return CSS3_NAMES[closest_palette_index(requested_colours, CSS3_RGB, chunk_size)]
+
+
+def closest_palette_index(requested_colours, palette, chunk_size=CLASSIFY_CHUNK_SIZE):
+    """Returns the row of the closest 'palette' color of every RGB input, ties going to the last row
+
+        Inputs:
+            (Array-Like of shape (n, 3)) - 'requested_colours': The RGB values of the colors i.e [(0,0,0),(255,255,255)]
+            (numpy.ndarray of shape (m, 3)) - 'palette' : The RGB values of the colors to choose from
+            (Int) - 'chunk_size' : How many colors to compare against the palette at once
+        Outputs:
+            (numpy.ndarray of Ints) - The row in 'palette' of the closest color to every input
+    """
+    rgb = np.asarray(requested_colours, dtype=np.float32).reshape(-1, 3)
+    # Search the palette backwards so argmin's first hit is the last tied color
+    flipped = np.asarray(palette, dtype=np.float32)[::-1]
+    last = len(flipped) - 1
+    # |x - p|^2 = |x|^2 - 2x.p + |p|^2 and |x|^2 doesn't change which p is closest
+    # with 8 bit colors every term is an integer below 2**24 so float32 is exact
+    norms = (flipped ** 2).sum(axis=1)
+    rv = np.empty(len(rgb), dtype=np.intp)
+    for start in range(0, len(rgb), chunk_size):
+        dist = norms - 2 * rgb[start:start + chunk_size] @ flipped.T
+        rv[start:start + chunk_size] = last - dist.argmin(axis=1)
+    return rv
+
+
 def closest_colour(requested_colour):
     """Returns Closest Color in String Format given RGB input
 
@@ -41,20 +95,10 @@ def closest_colour(requested_colour):
         Outputs:
             (string) - The Closest definable color as per the CSS3 color library
 
-        DISCLAIMER: THIS IS NOT MY CODE 
-        Thank you to SBRG who uses and MIT liscense and to the open-source comunity
+        Thank you to SBRG who uses and MIT liscense and to the open-source comunity for the original version
         Source: https://www.programcreek.com/python/example/97156/webcolors.hex_to_rgb
-
-
     """
-    min_colours = {}
-    for key, name in webcolors.CSS3_HEX_TO_NAMES.items():
-        r_c, g_c, b_c = webcolors.hex_to_rgb(key)
-        rd = (r_c - requested_colour[0]) ** 2
-        gd = (g_c - requested_colour[1]) ** 2
-        bd = (b_c - requested_colour[2]) ** 2
-        min_colours[(rd + gd + bd)] = name
-    return min_colours[min(min_colours.keys())]
+    return closest_colours([requested_colour])[0]
 
 
 def return_closest_RGBcolor(requested_colour):
@@ -69,17 +113,227 @@ def return_closest_RGBcolor(requested_colour):
     https://stackoverflow.com/questions/9694165/convert-rgb-color-to-english-color-name-like-green-with-python
 
     """
-    # Try and see if there is a direct hit in the range for a specific color name
-    try:
-        closest_name = actual_name = webcolors.rgb_to_name(requested_colour)
-    except ValueError:
-        # Get the closest definable color in CSS3
-        closest_name = closest_colour(requested_colour)
-        actual_name = None
-    # Return Best of two options
-    if actual_name:
-        return actual_name
-    return closest_name
+    # A direct hit on a specific color name is at distance 0 so it is always the closest color
+    return closest_colour(requested_colour)
+
+
+# The ways we can measure how far apart two colors are
+COLOR_METRICS = ['rgb', 'cie76', 'ciede2000']
+# CIEDE2000 isn't a distance a KD-tree can search, the closest colors in CIELAB are re-ranked starting from this many,
+# four times more each round until 'ciede2000_lower_bound' proves no color left out is closer
+CIEDE2000_CANDIDATES = 16
+# The most (color, candidate) pairs whose CIEDE2000 difference is computed at once
+CIEDE2000_CHUNK_PAIRS = 2**20
+# sRGB D65 -> CIE XYZ and the D65 white point
+SRGB_TO_XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                        [0.2126729, 0.7151522, 0.0721750],
+                        [0.0193339, 0.1191920, 0.9503041]])
+D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+def rgb_to_lab(rgb):
+    """ Converts sRGB colors to CIELAB so that distances follow how different colors look
+
+        Inputs:
+            (Array-Like of shape (..., 3)) - 'rgb' : The RGB values of the colors i.e [(0,0,0),(255,255,255)]
+        Outputs:
+            (numpy.ndarray of shape (..., 3)) - The L*, a*, b* values of the colors
+    """
+    c = np.asarray(rgb, dtype=np.float64) / 255
+    linear = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ SRGB_TO_XYZ.T / D65_WHITE
+    eps = (6 / 29) ** 3
+    f = np.where(xyz > eps, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    L = 116 * f[..., 1] - 16
+    a = 500 * (f[..., 0] - f[..., 1])
+    b = 200 * (f[..., 1] - f[..., 2])
+    return np.stack([L, a, b], axis=-1)
+
+
+def delta_e_ciede2000(lab1, lab2):
+    """ The CIEDE2000 color difference between pairs of CIELAB colors
+
+        Inputs:
+            (numpy.ndarray of shape (..., 3)) - 'lab1', 'lab2' : The CIELAB colors to compare, broadcast against each other
+        Outputs:
+            (numpy.ndarray of shape (...)) - The color difference of every pair
+    """
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+    c_bar7 = ((np.hypot(a1, b1) + np.hypot(a2, b2)) / 2) ** 7
+    g = 0.5 * (1 - np.sqrt(c_bar7 / (c_bar7 + 25 ** 7)))
+    a1p, a2p = (1 + g) * a1, (1 + g) * a2
+    c1p, c2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+    achromatic = c1p * c2p == 0
+
+    # Differences in lightness, chroma and hue
+    dLp, dCp = L2 - L1, c2p - c1p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, np.where(dhp < -180, dhp + 360, dhp))
+    dhp = np.where(achromatic, 0, dhp)
+    dHp = 2 * np.sqrt(c1p * c2p) * np.sin(np.radians(dhp / 2))
+
+    # Means used by the weighting functions
+    L_bar, c_barp = (L1 + L2) / 2, (c1p + c2p) / 2
+    h_sum = h1p + h2p
+    h_bar = np.where(achromatic, h_sum, np.where(np.abs(h1p - h2p) <= 180, h_sum / 2,
+                                                 np.where(h_sum < 360, (h_sum + 360) / 2, (h_sum - 360) / 2)))
+    t = (1 - 0.17 * np.cos(np.radians(h_bar - 30)) + 0.24 * np.cos(np.radians(2 * h_bar))
+         + 0.32 * np.cos(np.radians(3 * h_bar + 6)) - 0.20 * np.cos(np.radians(4 * h_bar - 63)))
+    d_theta = 30 * np.exp(-((h_bar - 275) / 25) ** 2)
+    r_c = 2 * np.sqrt(c_barp ** 7 / (c_barp ** 7 + 25 ** 7))
+    s_l = 1 + 0.015 * (L_bar - 50) ** 2 / np.sqrt(20 + (L_bar - 50) ** 2)
+    s_c = 1 + 0.045 * c_barp
+    s_h = 1 + 0.015 * c_barp * t
+    r_t = -np.sin(np.radians(2 * d_theta)) * r_c
+    return np.sqrt((dLp / s_l) ** 2 + (dCp / s_c) ** 2 + (dHp / s_h) ** 2 + r_t * (dCp / s_c) * (dHp / s_h))
+
+
+def ciede2000_lower_bound(lab, d76):
+    """ A lower bound on the CIEDE2000 difference between CIELAB colors and any color at least 'd76' away from them in CIELAB
+            The rotation term takes at most sin(60) of the chroma and hue terms, S_H is at most S_C, S_L is at most 1.75
+            and a* is only ever stretched so the chroma and hue differences are at least those of a* and b*.
+            A chroma C' is at most 1.5 C, so S_C is at most 1 + 0.0675 (C + d76 / 2) with C the chroma of 'lab'.
+            The bound grows with 'd76', so it also holds for every color farther away.
+
+        Inputs:
+            (numpy.ndarray of shape (..., 3)) - 'lab' : The CIELAB colors
+            (numpy.ndarray of shape (...)) - 'd76' : The CIE76 difference (Euclidean CIELAB distance) of each
+        Outputs:
+            (numpy.ndarray of shape (...)) - The least CIEDE2000 difference of every color
+    """
+    chroma = np.hypot(lab[..., 1], lab[..., 2])
+    return d76 * np.sqrt(1 - np.sqrt(3) / 2) / (1 + 0.0675 * (chroma + d76 / 2))
+
+
+class ColorBinner:
+    """
+        A Palette of Color Bins compiled once into a KD-tree so any number of colors 
+        can be binned together without comparing each one to every color of the palette. 
+
+        attr :: self.names - The name of every color bin 
+        attr :: self.rgb - The RGB value of every color bin 
+        attr :: self.metric - How color differences are measured: 'rgb' (Euclidean RGB), 'cie76' (CIELAB Delta E 1976) or 'ciede2000'
+        attr :: self.points - The coordinates of the bins in the space of the metric 
+        attr :: self.tree - The scipy.spatial.cKDTree over 'self.points'
+    """
+
+    def __init__(self, palette=DEFAULT_COLORS, metric='rgb'):
+        """ ColorBinner Constructor
+
+            param :: 'palette' - A list of CSS3 color names or a dictionary of {name : (r,g,b)} i.e for pigment standards
+            param :: 'metric' - One of COLOR_METRICS
+        """
+        assert metric in COLOR_METRICS, f"Color metric must be one of {COLOR_METRICS}"
+        if isinstance(palette, dict):
+            names, rgb = list(palette.keys()), list(palette.values())
+        else:
+            names = list(palette)
+            rgb = [tuple(webcolors.name_to_rgb(i))[0:3] for i in names]
+        self.names = np.array(names, dtype=object)
+        self.rgb = np.array(rgb, dtype=np.float64).reshape(-1, 3)
+        self.metric = metric
+        self.points = self.rgb if metric == 'rgb' else rgb_to_lab(self.rgb)
+        self.tree = cKDTree(self.points)
+        # Equally close bins are settled by name, like taking the min of (distance, name)
+        self._rank = np.argsort(np.argsort(self.names.astype(str)))
+
+    def query_index(self, rgb):
+        """ Returns the position of the closest bin of every color
+
+            Inputs:
+                (Array-Like of shape (n, 3)) - 'rgb' : The RGB values of the colors i.e [(0,0,0),(255,255,255)]
+            Outputs:
+                (numpy.ndarray of Ints) - The position in 'self.names' of the bin of every color
+        """
+        rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+        if len(rgb) == 0:
+            return np.zeros(0, dtype=np.intp)
+        points = rgb if self.metric == 'rgb' else rgb_to_lab(rgb)
+        if self.metric == 'ciede2000':
+            return self.query_ciede2000(points)
+        k = min(len(self.names), 4)
+        dist, idx = self.tree.query(points, k=k)
+        return self.closest(dist.reshape(len(points), k), idx.reshape(len(points), k))
+
+    def closest(self, dist, idx):
+        """ Returns the closest candidate bin of every color, equally close bins are settled by name
+
+            Inputs:
+                (numpy.ndarray of shape (n, k)) - 'dist' : The distance of each candidate bin of every color
+                (numpy.ndarray of shape (n, k)) - 'idx' : The position of each candidate bin of every color
+            Outputs:
+                (numpy.ndarray of Ints) - The position in 'self.names' of the bin of every color
+        """
+        tied = np.isclose(dist, dist.min(axis=1, keepdims=True), rtol=0, atol=1e-9)
+        rank = np.where(tied, self._rank[idx], len(self.names))
+        return idx[np.arange(len(idx)), rank.argmin(axis=1)]
+
+    def query_ciede2000(self, lab):
+        """ Returns the position of the bin closest to every CIELAB color by CIEDE2000, the same bin as comparing
+                every color to every bin: a color keeps widening its candidates until the lower bound of the
+                farthest one is above the closest, or until every bin is a candidate
+
+            Inputs:
+                (numpy.ndarray of shape (n, 3)) - 'lab' : The CIELAB colors
+            Outputs:
+                (numpy.ndarray of Ints) - The position in 'self.names' of the bin of every color
+        """
+        rv = np.empty(len(lab), dtype=np.intp)
+        todo = np.arange(len(lab))
+        k = min(len(self.names), CIEDE2000_CANDIDATES)
+        while len(todo):
+            unproven = []
+            step = max(1, CIEDE2000_CHUNK_PAIRS // k)
+            for start in range(0, len(todo), step):
+                rows = todo[start:start + step]
+                d76, idx = self.tree.query(lab[rows], k=k)
+                d76, idx = d76.reshape(len(rows), k), idx.reshape(len(rows), k)
+                dist = delta_e_ciede2000(lab[rows, None, :], self.points[idx])
+                proven = np.ones(len(rows), dtype=bool)
+                if k < len(self.names):
+                    bound = ciede2000_lower_bound(lab[rows], d76[:, -1])
+                    proven = dist.min(axis=1) < bound - 1e-9
+                rv[rows[proven]] = self.closest(dist[proven], idx[proven])
+                unproven.append(rows[~proven])
+            todo = np.concatenate(unproven)
+            k = min(len(self.names), 4 * k)
+        return rv
+
+    def query(self, rgb):
+        """ Returns the name of the closest bin of every color
+
+            Inputs:
+                (Array-Like of shape (n, 3)) - 'rgb' : The RGB values of the colors i.e [(0,0,0),(255,255,255)]
+            Outputs:
+                (numpy.ndarray of Strings) - The bin of every color
+        """
+        return self.names[self.query_index(rgb)]
+
+    def query_names(self, color_names):
+        """ Returns the name of the closest bin of every named color
+
+            Inputs:
+                (List of Strings) - 'color_names' : Names of colors in the CSS3 library i.e ['snow','darkkhaki']
+            Outputs:
+                (numpy.ndarray of Strings) - The bin of every color
+        """
+        return self.query([tuple(webcolors.name_to_rgb(i))[0:3] for i in color_names])
+
+
+@functools.lru_cache(maxsize=32)
+def get_color_binner(palette=tuple(DEFAULT_COLORS), metric='rgb'):
+    """ Returns the compiled ColorBinner of a palette, every palette is only compiled once
+
+        Inputs:
+            (Tuple of Strings) - 'palette' : The names of the color bins
+            (String) - 'metric' : One of COLOR_METRICS
+        Outputs:
+            (ColorBinner Object Class) - The compiled palette
+    """
+    return ColorBinner(list(palette), metric)
 
 
 def closest_bincolor(input_color, def_colors=DEFAULT_COLORS):
@@ -91,91 +345,216 @@ def closest_bincolor(input_color, def_colors=DEFAULT_COLORS):
         Outputs:
             (String) : The color in 'def_colors' closest to 'input_color' in RGB space
     """
-    r, g, b = webcolors.name_to_rgb(input_color)[0:3]
-    color_diffs = []
+    return get_color_binner(tuple(def_colors)).query_names([input_color])[0]
 
-    for color in def_colors:
-        cr, cg, cb = webcolors.name_to_rgb(color)[0:3]
-        color_diff = math.sqrt(
-            abs(r - cr)**2 + abs(g - cg)**2 + abs(b - cb)**2)
-        color_diffs.append((color_diff, color))
 
-    return min(color_diffs)[1]
+# Every 24-bit color already has a closest color, we keep that answer for all of them on disk
+LUT_DIR = os.path.join(DEFAULT_CACHE_DIR, 'color_luts')
+# Sample tables with at least this many rows are classified with a lookup table
+LUT_MIN_ROWS = 100000
+# Lookup tables already opened in this session
+_LUTS = {}
 
 
-def reindex_hierarchy(df, with_color=False, mutants=False):
-    """ Alters a DataFrame creating a New Column by which to re-index the table entries by 
-        Used for to create a color mapping between a key:value for our data visualizations 
+def palette_key(color_bins=None):
+    """ Names the lookup table of a palette after its content
+
+        Inputs:
+            (List of Strings or None) - 'color_bins' : The colors to bin by i.e ['white','black'] or None for the whole CSS3 library
+        Outputs:
+            (string) - hex digest of the palette
+    """
+    h = hashlib.sha256(CSS3_RGB.tobytes())
+    h.update('|'.join(CSS3_NAMES).encode())
+    if color_bins is not None:
+        h.update(('bins:' + '|'.join(color_bins)).encode())
+    return h.hexdigest()[:20]
+
+
+def get_color_lut(color_bins=None, lut_dir=None):
+    """ Returns the lookup table from every 24-bit RGB value to the position of its color in the palette
+            The table is built once per palette, saved in 'lut_dir' and memory-mapped from then on
+
+        Inputs:
+            (List of Strings or None) - 'color_bins' : The colors to bin by i.e ['white','black'] or None for the whole CSS3 library
+            (string or None) - 'lut_dir' : Where the lookup tables are kept, if None then LUT_DIR
+        Outputs:
+            (Tuple) - 'lut', 'names' : (numpy.ndarray of 2**24 small ints) indexed by (r << 16 | g << 8 | b), and the color name of each position
+    """
+    lut_dir = LUT_DIR if lut_dir is None else lut_dir
+    key = palette_key(color_bins)
+    names = CSS3_NAMES if color_bins is None else np.array(
+        list(color_bins), dtype=object)
+    path = os.path.join(lut_dir, f"lut_{key}.npy")
+    if path in _LUTS:
+        return _LUTS[path], names
+
+    if not os.path.exists(path):
+        if color_bins is None:
+            # Every one of the 2**24 colors, in the order of their lookup position
+            codes = np.arange(2 ** 24, dtype=np.uint32)
+            rgb = np.stack([codes >> 16, (codes >> 8) & 255, codes & 255], axis=1)
+            lut = closest_palette_index(rgb, CSS3_RGB).astype(np.uint8)
+        else:
+            # A bin is picked from the closest CSS3 color, so we only have to bin the CSS3 library once
+            css3_lut, _ = get_color_lut(None, lut_dir)
+            css3_to_bin = get_color_binner(
+                tuple(names)).query_index(CSS3_RGB)
+            dtype = np.uint8 if len(names) <= 256 else np.uint16
+            lut = css3_to_bin.astype(dtype)[css3_lut]
+        os.makedirs(lut_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, lut)
+        os.replace(tmp, path)
+
+    _LUTS[path] = np.load(path, mmap_mode='r')
+    return _LUTS[path], names
+
+
+def lookup_colours(requested_colours, color_bins=None):
+    """ Returns the closest color of every RGB input through the lookup table of the palette
+            Works on any shape of RGB data i.e a list of scales (n, 3) or the pixels of an image (h, w, 3)
+
+        Inputs:
+            (Array-Like of shape (..., 3)) - 'requested_colours' : The RGB values of the colors i.e [(0,0,0),(255,255,255)]
+            (List of Strings or None) - 'color_bins' : The colors to bin by i.e ['white','black'] or None for the whole CSS3 library
+        Outputs:
+            (numpy.ndarray of Strings of shape (...)) - The closest color name of every input
+    """
+    lut, names = get_color_lut(color_bins)
+    rgb = np.asarray(requested_colours, dtype=np.uint32)
+    codes = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    return names[lut[codes]]
+
+
+def factorize_as_strings(column):
+    """ Returns the integer code of every entry of a column and the distinct entries written as strings 
+            Missing entries are written 'nan' just like 'str' does
+
+        Inputs:
+            ('Pandas.Series' Object Class) - 'column' : Any column of our data
+        Outputs:
+            (Tuple) - 'codes', 'uniques' : (numpy.ndarray of Ints) and (numpy.ndarray of Strings)
+    """
+    codes, uniques = pd.factorize(column)
+    uniques = np.append(np.asarray(uniques, dtype=object).astype(str), 'nan')
+    codes = np.where(codes == -1, len(uniques) - 1, codes)
+    return codes, uniques
+
+
+def hierarchy_key_columns(df, sheet_name='wt_table'):
+    """ Finds the columns our custom index is built from by name: species, genotype and the two color columns of the sheet
+            i.e 'labeled_color','irr_color' for samples, 'scale_color','irr_color' for wt and 'scale_color','scale_color_post' for mutants
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
+            (string) - 'sheet_name' : The sheet 'df' comes from i.e 'wt_table','mutant_table','samples_info'
+        Outputs:
+            (List of Strings) - The names of the species, genotype, first color and second color columns
+    """
+    columns = list(SHEET_INDEX_COLUMNS[sheet_name])
+    for c in columns:
+        if c not in df.columns:
+            raise KeyError(f"The {sheet_name} table has no column '{c}' to build the index from")
+    return columns
+
+
+def hierarchy_keys(df, with_color=False, mutants=False, sheet_name=None):
+    """ Builds the custom index of every row of a DataFrame as integer codes into the distinct index strings
+            Each distinct (species, genotype, color, color) combination is written out once rather than once per row
 
         Inputs:
             ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
             (Boolean) - 'with_color' : Include the color of the scale in the new index
             (Boolean) - 'mutants' : Is the DataFrame 'df' that of the mutant scale data
+            (string or None) - 'sheet_name' : The sheet 'df' comes from, if None then 'mutant_table' for mutants otherwise 'wt_table'
         Outputs:
-            ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, Wt Morphometric Data, or Mutant Data from our study with a new column 'index'
+            ('Pandas.Categorical' Object Class) - The index of every row
     """
-    # Init list to return a column with a new index
-    # Iterate through the rows of the DataFrame and make a new index for each row
-    rv, H = [], df.to_numpy()
-    r, _ = H.shape
-    # Column indexes in our table reffering to Species,Genotype,Color_Feature_1, Color_Feature_2
-    SP_INDEX, GENO_INDEX, C1_INDEX, C2_INDEX = 4, 5, 6, 7
-    for i in range(r):
+    sheet_name = sheet_name or ('mutant_table' if mutants else 'wt_table')
+    columns = hierarchy_key_columns(df, sheet_name) if with_color else ['species', 'genotype']
+    factorized = [factorize_as_strings(df[c]) for c in columns]
+    # Pack the codes of the columns into one integer per row and number the distinct combinations
+    packed = np.zeros(len(df), dtype=np.int64)
+    for codes, uniques in factorized:
+        packed = packed * len(uniques) + codes
+    combo, combos = pd.factorize(packed)
+    # Unpack the distinct combinations back into the value of every column
+    parts = []
+    for codes, uniques in reversed(factorized):
+        combos, digit = np.divmod(combos, len(uniques))
+        parts.insert(0, uniques[digit])
+    # Write out the index of every combination
+    keys = []
+    for row in zip(*parts):
         # Index our entries based off 'string': <species> and 'string': <genotype>
-        new_index = " ".join([str(H[i][SP_INDEX]), str(H[i][GENO_INDEX])])
-        # All our DataTables have 2 color entries in their data entry
-        c1, c2 = str(H[i][C1_INDEX]), str(H[i][C2_INDEX])
-        # Do we include the color of the scale in the new index
+        new_index = " ".join(row[0:2])
         if with_color and not mutants:
             # We are not dealing with a mutant we only care about the scale and iridescent color
-            scale_color, irr_color = c1, c2
+            scale_color, irr_color = row[2], row[3]
             # Check for iridescent color as that tends to be the dominant visible color
             if irr_color not in ['', 'nan']:
                 new_index += ' ' + scale_color + ' + i(' + irr_color + ')'
             else:
                 new_index += ' ' + scale_color
-
         elif with_color and mutants:
             # Get the color of the mutant before and after the mutation
-            color_transition = "->".join([c1, c2])
-            new_index += ' ' + color_transition
-        # Add the new entries to the list
-        rv.append(new_index)
-    df['index'] = rv
-    return df
+            new_index += ' ' + "->".join(row[2:4])
+        keys.append(new_index)
+    # Diffrent combinations can write the same index i.e no iridescent color given as '' or 'nan'
+    key_codes, categories = pd.factorize(np.array(keys, dtype=object))
+    return pd.Categorical.from_codes(key_codes[combo], categories)
 
 
-def fill_dictionary(df, k, v):
-    """ Maps Keys to Values by row entry in DataFrame returning a dictionary of mappings
-        Given a DataFrame 'df' containing columns 'k','v' map entries.
+def reindex_hierarchy(df, with_color=False, mutants=False, sheet_name=None):
+    """ Returns a DataFrame with a New Column by which to re-index the table entries by, 'df' itself is left as is
+        Used for to create a color mapping between a key:value for our data visualizations 
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
+            (Boolean) - 'with_color' : Include the color of the scale in the new index
+            (Boolean) - 'mutants' : Is the DataFrame 'df' that of the mutant scale data
+            (string or None) - 'sheet_name' : The sheet 'df' comes from, if None then 'mutant_table' for mutants otherwise 'wt_table'
+        Outputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, Wt Morphometric Data, or Mutant Data from our study with a new categorical column 'index'
+    """
+    return with_columns(df, index=hierarchy_keys(df, with_color, mutants, sheet_name))
+
+
+def fill_dictionary_with_conflicts(df, k, v):
+    """ Maps Keys to Values by row entry in DataFrame in a single grouped pass over the rows
+        Keys with more than one value are left out of the mapping and listed in a conflict report instead.
 
         Inputs:
             ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
             (string)- 'k' : The column which is to be the keys in this mapping.                 ~ It MUST BE A COLUMN IN THE DF
             (string)- 'v' : The column which is to be the value to the key 'k' in this mapping. ~ It MUST BE A COLUMN IN THE DF
         Outputs:
-            (Dictionary): 'd_2': A dictionary returning all the values of df[k] : df[v] by row 
+            (Tuple) - 'd', 'conflicts' : (Dictionary) the one-to-one mapping of df[k] : df[v] in order of first appearance 
+                                         and ('Pandas.DataFrame' Object Class) one row per conflicting key with its competing 'values'
     """
-    # init dict, get all key:value pairs in order
-    d, d_2 = {}, {}
-    values = df[v].tolist()
-    keys = df[k].tolist()
-    # Go through them and see if their are no conflicting values (ideally we want a 1:1 mapping)
-    for i, val in enumerate(values):
-        key = keys[i]
-        if key not in set(d.keys()):
-            d[key] = [val]
+    # All the distinct values of every key, in order
+    values = df.groupby(k, sort=False, observed=True, dropna=False)[v].unique()
+    n_values = values.map(len)
+    d = {key: vals[0] for key, vals in values[n_values == 1].items()}
+    conflicts = values[n_values > 1]
+    conflicts = pd.DataFrame(
+        {k: conflicts.index, 'values': [list(i) for i in conflicts]})
+    return d, conflicts
 
-        elif val in set(d[key]):
-            pass
 
-        else:
-            d[key].append(val)
-    # Remove List within dictionary for keys with one-to-one mapping
-    for k, v in d.items():
-        if len(v) == 1:
-            d_2[k] = v[0]
+def fill_dictionary(df, k, v):
+    """ Maps Keys to Values by row entry in DataFrame returning a dictionary of mappings
+        Given a DataFrame 'df' containing columns 'k','v' map entries.
 
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
+            (string)- 'k' : The column which is to be the keys in this mapping.                 ~ It MUST BE A COLUMN IN THE DF
+            (string)- 'v' : The column which is to be the value to the key 'k' in this mapping. ~ It MUST BE A COLUMN IN THE DF
+        Outputs:
+            (Dictionary): 'd_2': A dictionary returning all the values of df[k] : df[v] by row for keys with one-to-one mapping
+    """
+    d_2, _ = fill_dictionary_with_conflicts(df, k, v)
     return d_2
 
 
@@ -260,53 +639,134 @@ def split_by_irridesence(df_samples):
     return irr, no_irr
 
 
-def add_color_classification_from_rbg_code(df_samples, color_bins=DEFAULT_COLORS):
+# How an RGB code is written in our DataTable once cleaned i.e 'rgb(255,165,0)'
+RGB_CODE_PATTERN = r'^rgb\((\d{1,3}),(\d{1,3}),(\d{1,3})\)$'
+
+
+def parse_rgb_codes(codes):
+    """ Parses a column of RGB codes into a matrix of RGB values in one pass
+            Only the distinct codes are parsed, missing and malformed codes are flagged instead of raising,
+            channels above 255 are kept as they are so they are still classified (see 'add_color_classifications_from_rbg_code')
+
+        Inputs:
+            (Array-Like of Strings) - 'codes' : The RGB codes i.e ['rgb(255,165,0)', 'nan', ...]
+        Outputs:
+            (Tuple) - 'rgb', 'valid' : (numpy.ndarray of int16 of shape (n, 3)) the RGB values, 0 where invalid 
+                                       and (numpy.ndarray of Booleans) which rows held a valid code
+    """
+    position, uniques = pd.factorize(np.asarray(codes, dtype=object))
+    parts = pd.Series(uniques, dtype=object).astype(str).str.replace(
+        ' ', '', regex=False).str.lower().str.extract(RGB_CODE_PATTERN)
+    values = parts.to_numpy(dtype=np.float64, na_value=np.nan)
+    # Missing entries (position -1) point at an extra invalid row
+    values = np.vstack([values, np.full((1, 3), np.nan)])
+    unique_valid = ~np.isnan(values).any(axis=1)
+    rgb = np.where(unique_valid[:, None], np.nan_to_num(values), 0).astype(np.int16)
+    return rgb[position], unique_valid[position]
+
+
+def labeled_column(column, name):
+    """ Returns the name of the column holding the labeling 'name' of 'column'
+            i.e 'scale_color' and 'closest' -> 'scale_color_closest', an empty name keeps the column itself
+
+        Inputs:
+            (String) - 'column' : The column being labeled i.e 'classified_color' or 'scale_color'
+            (String) - 'name' : The name of the labeling i.e 'rgb' or 'closest'
+        Outputs:
+            (String) - The name of the labeled column
+    """
+    return column + '_' + name if name else column
+
+
+def add_color_classifications_from_rbg_code(df_samples, labelings, use_lut=None):
+    """ Classifies the RGB code of every sample once for each labeling in 'labelings'
+            The RGB codes are parsed and matched to CSS3 a single time, each labeling then only bins the matches
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df_samples' : The Sample Data for our study
+            (Dictionary) - 'labelings' : The name of each labeling : its color bins (List of Strings) or 'None' for no binning
+            (Boolean or None) - 'use_lut' : Classify through the 24-bit lookup tables, if None then only for tables of LUT_MIN_ROWS rows or more
+
+        Outputs:
+            ('Pandas.DataFrame' Object Class) - The samples data with one 'classified_color_<name>' column per labeling
+    """
+    # Rows without a readable rgb code have no classification
+    rgb, valid = parse_rgb_codes(df_samples['rbg_color'].values)
+    if use_lut is None:
+        use_lut = valid.sum() >= LUT_MIN_ROWS
+    # The lookup tables only hold 8 bit channels, codes with a channel above 255 are matched directly
+    in_lut = valid & (rgb <= 255).all(axis=1) if use_lut else np.zeros(len(rgb), dtype=bool)
+    direct = valid & ~in_lut
+    nearest = None
+
+    columns = {}
+    for name, color_bins in labelings.items():
+        rv = np.full(len(rgb), None, dtype=object)
+        if in_lut.any():
+            # Large tables go straight from RGB to the color bin through the lookup table
+            rv[in_lut] = lookup_colours(rgb[in_lut], color_bins)
+        if direct.any():
+            # convert them all to the nearest rgb_defined_color at once, shared by every labeling
+            if nearest is None:
+                nearest = closest_palette_index(rgb[direct], CSS3_RGB)
+            # If default colors are provided match within that list, else just take the nearest color
+            if color_bins != None:
+                binner = get_color_binner(tuple(color_bins))
+                rv[direct] = binner.names[binner.query_index(CSS3_RGB[nearest])]
+            else:
+                rv[direct] = CSS3_NAMES[nearest]
+        columns[labeled_column('classified_color', name)] = rv
+    return with_columns(df_samples, **columns)
+
+
+def add_color_classification_from_rbg_code(df_samples, color_bins=DEFAULT_COLORS, use_lut=None):
     """ Changes the Labled Color in df_samples from the Publication to the closest RGB color
             if color_bins is 'None' otherwises chooses closest color to labeled color from 'color_bins'
 
         Inputs:
             ('Pandas.DataFrame' Object Class) - 'df_samples' : The Sample Data for our study
             (List of Strings) - 'color_bins' : The baseline name of colors to re-organize our labeled data around i.e ['white','black'] or 'None' for no binning
+            (Boolean or None) - 'use_lut' : Classify through the 24-bit lookup tables, if None then only for tables of LUT_MIN_ROWS rows or more
 
         Outputs:
-            ('Pandas.DataFrame' Object Class) - 'df_samples' : The modified samples data for our study
+            ('Pandas.DataFrame' Object Class) - The samples data for our study with the column 'classified_color'
     """
-    res = []
-    rbg = df_samples['rbg_color'].values
+    return add_color_classifications_from_rbg_code(df_samples, {'': color_bins}, use_lut)
 
-    # convert to nearest rgb_defined_color
-    for c in rbg:
-        truple = c[4:]
-        truple = truple[:len(truple)-1]
-        truple = truple.split(',')
 
-        if type(truple) != str and truple[0] != '':
-            # conv str input and return
-            truple = [int(i) for i in truple]
-            col = return_closest_RGBcolor(truple)
-            res.append(col)
-        else:
-            res.append(None)
+def classify_samples(df_samples, labelings):
+    """ Indexes the samples by hierarchy and classifies their RGB codes for every labeling in one pass
 
-    # now we turn the closest values into the nearest value in our res list
-    # default color inputs
-    rv = []
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df_samples' : The Sample Data for our study
+            (Dictionary) - 'labelings' : The name of each labeling : its color bins or 'None' for the closest CSS3 color
+        Outputs:
+            ('Pandas.DataFrame' Object Class) - The samples with an 'index' column and one 'classified_color_<name>' column per labeling
+    """
+    return add_color_classifications_from_rbg_code(
+        reindex_hierarchy(df_samples, with_color=True, sheet_name='samples_info'), labelings)
 
-    # If default colors are provided match within that list, else just take the nearest color
-    if color_bins != None:
-        for rgb_color in res:
-            if rgb_color != None:
-                classified_color = closest_bincolor(
-                    rgb_color, def_colors=color_bins)
-                rv.append(classified_color)
-            else:
-                rv.append(None)
-        df_samples['classified_color'] = rv
 
-    else:
-        df_samples['classified_color'] = res
+def validated_indexes(samples, column='classified_color'):
+    """ Lists the indexes whose samples were classified as the color given in the publication
 
-    return df_samples
+            The iridescent color is checked for iridescent scales and the labeled color for the pigmented ones
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'samples' : The classified samples (see 'classify_samples')
+            (String) - 'column' : The column holding the classification to check
+        Outputs:
+            (List) - The correctly classified indexes
+    """
+    # break it down by irr and non-irr colors
+    irr, no_irr = split_by_irridesence(samples)
+    # irr_color is determined color
+    irr_correct = irr.loc[irr['irr_color'].astype(object) ==
+                          irr[column]]['index'].tolist()
+    # pigmented color is determined color
+    no_irr_correct = no_irr.loc[no_irr['labeled_color'].astype(object)
+                                == no_irr[column]]['index'].tolist()
+    return irr_correct + no_irr_correct
 
 
 def drop_misclassified_colors(df_samples, df_data, color_bins=DEFAULT_COLORS):
@@ -322,31 +782,49 @@ def drop_misclassified_colors(df_samples, df_data, color_bins=DEFAULT_COLORS):
                 (Tuple of Pandas.DataFrame' Object Classes) - 'samples', 'df' : updated samples and wt morphometric data
 
     """
-    # initialize rv to return correctly classified indexes
-    rv = []
-    # re-index one another
-    samples, df = reindex_hierarchy(
-        df_samples, with_color=True), reindex_hierarchy(df_data, with_color=True)
-    # get the rbg color
-    samples = add_color_classification_from_rbg_code(samples, color_bins)
-    # break it down by irr and non-irr colors
-    irr, no_irr = split_by_irridesence(df_samples)
-    # irr_color is determined color
-    irr_correct = irr.loc[irr['irr_color'] ==
-                          irr['classified_color']]['index'].tolist()
-    # pigmented color is determined color
-    no_irr_correct = no_irr.loc[no_irr['labeled_color']
-                                == no_irr['classified_color']]['index'].tolist()
-    # Append using += using python list feature
-    rv += irr_correct
-    rv += no_irr_correct
+    # re-index one another and get the rbg color
+    samples = classify_samples(df_samples, {'': color_bins})
+    df = reindex_hierarchy(df_data, with_color=True, sheet_name='wt_table')
+    rv = validated_indexes(samples)
     # Apply a filter to original DataFrames to only allow those that were correctly classified
     s_filter, d_filter = samples['index'].isin(rv), df['index'].isin(rv)
     samples, df = samples[s_filter], df[d_filter]
     return samples, df
 
 
-def correct_color_description_using_rbg_codes(df_samples, df_data, mutants=False, colors=DEFAULT_COLORS):
+def label_data(samples, df_data, labelings, mutants=False, report=False):
+    """ Relabels the scale colors of 'df_data' with every labeling of the classified samples
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'samples' : The classified samples (see 'classify_samples')
+            ('Pandas.DataFrame' Object Class) - 'df_data' : The Morphometric Data for our study of wilde type or mutant species
+            (Dictionary or List) - 'labelings' : The names of the labelings to apply, an empty name replaces the scale color itself
+            (Boolean) - 'mutants' : Is the 'df_data' variable mutant data
+            (Boolean) - 'report' : Also return the indexes that could not be relabeled for each labeling (see 'relabel_report')
+        Outputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The data with one 'scale_color_<name>' or 'scale_color_post_<name>' column per labeling (, reports)
+    """
+    # Apply New RGB Colors replacing them for the WT and mutant DataSets
+    # set the 'scale_color' or 'scale_color_post' variable of every index to its actual color in one lookup
+    df = reindex_hierarchy(df_data, with_color=True, mutants=mutants,
+                           sheet_name='mutant_table' if mutants else 'wt_table')
+    column = 'scale_color_post' if mutants else 'scale_color'
+    reports = {}
+    for name in labelings:
+        # Map the Custom Indexes -> string color name using a dictionary
+        d, conflicts = fill_dictionary_with_conflicts(
+            samples, k='index', v=labeled_column('classified_color', name))
+        df[labeled_column(column, name)] = relabel_by_key(
+            df['index'], df[column], d)
+        if report:
+            reports[name] = relabel_report(df, d, conflicts)
+
+    if report:
+        return df, reports
+    return df
+
+
+def correct_color_description_using_rbg_codes(df_samples, df_data, mutants=False, colors=DEFAULT_COLORS, report=False):
     """ Replaces the 'scale color' description with what the RBG value is closest to. 
         Replaces the scale color description of the 'df_data' table with a more accurate classification
         according to the CSS3 library. Input NoneType into colors to classify to closest possible defianable color in the CSS3 library. 
@@ -357,30 +835,67 @@ def correct_color_description_using_rbg_codes(df_samples, df_data, mutants=False
             (Boolean) - 'mutants' : Is the 'df_data' variable mutant data
             (List of Strings) - 'colors': A list of default colors to match to the labled color 
                                           if None then the color value will be changed to the closest identifiable color in CSS3
+            (Boolean) - 'report' : Also return the indexes that could not be relabeled (see 'relabel_report')
 
         Outputs:
-            (Tuple of 'Pandas.DataFrame' Object Classes) - df_samples, df_data 
+            (Tuple of 'Pandas.DataFrame' Object Classes) - df_samples, df_data (, report)
 
     """
-    # Map the Custom Indexes -> string color name using a dictionary
-    samples = add_color_classification_from_rbg_code(
-        reindex_hierarchy(df_samples, with_color=True), color_bins=colors)
-    d = fill_dictionary(samples, k='index', v='classified_color')
+    samples = classify_samples(df_samples, {'': colors})
+    if report:
+        df, reports = label_data(samples, df_data, [''], mutants, report=True)
+        return samples, df, reports['']
+    return samples, label_data(samples, df_data, [''], mutants)
 
-    # Apply New RGB Colors replacing them for the WT and mutant DataSets
-    # Iter through the indexes and their actual color
-    # and set the 'scale_color' or 'scale_color_post' variable to that value
-    if not mutants:
-        df = reindex_hierarchy(df_data, with_color=True)
-        for k, v in d.items():
-            df.loc[df_data['index'] == k, 'scale_color'] = v
 
-    else:
-        df = reindex_hierarchy(df_data, with_color=True, mutants=True)
-        for k, v in d.items():
-            df.loc[df_data['index'] == k, 'scale_color_post'] = v
+def relabel_by_key(keys, target, mapping):
+    """ Replaces the value of 'target' on every row whose key has a new value in 'mapping'
+            The new value is looked up once per distinct key and the rows are relabeled by their integer codes
+
+        Inputs:
+            ('Pandas.Series' Object Class) - 'keys' : The key of every row i.e the column 'index'
+            ('Pandas.Series' Object Class) - 'target' : The values to replace i.e the column 'scale_color'
+            (Dictionary) - 'mapping' : The new value of each key, None is written as missing
+        Outputs:
+            ('Pandas.Categorical' Object Class) - The relabeled values
+    """
+    keys, target = pd.Categorical(keys), pd.Categorical(target)
+    new = [i for i in set(mapping.values())
+           if i is not None and i not in target.categories]
+    target = target.add_categories(sorted(new))
+    position = {c: i for i, c in enumerate(target.categories)}
+    # -2 marks keys we have no new value for, -1 is a missing value
+    per_key = np.array([position.get(mapping[k], -1) if k in mapping else -2
+                        for k in keys.categories], dtype=np.intp)
+    mapped = np.where(keys.codes >= 0, per_key[keys.codes], -2)
+    codes = np.where(mapped == -2, target.codes, mapped)
+    return pd.Categorical.from_codes(codes, target.categories).remove_unused_categories()
 
-    return samples, df
+
+def relabel_report(df_data, mapping, conflicts):
+    """ Lists the indexes of 'df_data' which could not be relabeled from the samples
+
+            'unmatched' : no sample has this index
+            'ambiguous' : the samples of this index were classified as diffrent colors
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df_data' : The Morphometric Data with the column 'index'
+            (Dictionary) - 'mapping' : The one-to-one index : color mapping that was applied
+            ('Pandas.DataFrame' Object Class) - 'conflicts' : The conflicting indexes found by 'fill_dictionary_with_conflicts'
+        Outputs:
+            ('Pandas.DataFrame' Object Class) - one row per index with its 'status', number of 'rows' in 'df_data' and competing 'colors'
+    """
+    rows = df_data['index'].value_counts()
+    colors = dict(zip(conflicts['index'], conflicts['values']))
+    rv = []
+    for key, n in rows.items():
+        if n == 0 or key in mapping:
+            continue
+        if key in colors:
+            rv.append((key, 'ambiguous', n, sorted(colors[key], key=str)))
+        else:
+            rv.append((key, 'unmatched', n, []))
+    return pd.DataFrame(rv, columns=['index', 'status', 'rows', 'colors'])
 
 
 def gen_rgb_data(df_samples, df_data, mutants=False):
@@ -444,6 +959,138 @@ def gen_custom_closest(df_samples, df_data, colors=DEFAULT_COLORS, mutants=False
     return info, data
 
 
+def color_labelings(colors=None):
+    """ Names the bin lists to classify by for 'gen_all_classifications'
+
+        Inputs:
+            (None, List of Strings, List of Lists or Dictionary) - 'colors' : one bin list, several bin lists or named bin lists,
+                                                                              if None then DEFAULT_COLORS is used
+        Outputs:
+            (Dictionary) - The name of each labeling : its color bins, 'rgb' always comes first with no binning
+    """
+    if colors is None:
+        colors = DEFAULT_COLORS
+    if type(colors) == dict:
+        bins = dict(colors)
+    elif all(type(i) == str for i in colors):
+        bins = {'closest': list(colors)}
+    else:
+        bins = {'closest_' + str(i): list(c) for i, c in enumerate(colors)}
+    return {'rgb': None, **bins}
+
+
+def gen_all_classifications(df_samples, data_frames, colors=None):
+    """ Generates every color labeling of the data in one pass
+
+            The sample RGB codes are parsed and keyed once, then each labeling is written as an extra column:
+                - 'scale_color_rgb' : the closest identifiable color in CSS3
+                - 'scale_color_closest' (or 'scale_color_closest_<i>' / 'scale_color_<name>') : the closest color in each bin list
+                - 'validated' and 'scale_color_validated' : wild type rows whose labeled color is confirmed by DEFAULT_COLORS
+            Mutant data gets the same columns on 'scale_color_post' without the validated ones.
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df_samples' : The Sample Data for our study
+            (List of Tuples) - 'data_frames' : ('Pandas.DataFrame', Boolean) pairs of morphometric data and whether it is mutant data
+            (None, List of Strings, List of Lists or Dictionary) - 'colors' : the bin lists to classify by (see 'color_labelings')
+        Outputs:
+            (Tuple of 'Pandas.DataFrame' Object Classes) - 'samples' followed by every labeled data frame in order
+    """
+    labelings = color_labelings(colors)
+    samples = classify_samples(
+        df_samples, {**labelings, 'validated': DEFAULT_COLORS})
+    validated = validated_indexes(samples, 'classified_color_validated')
+
+    rv = [samples]
+    for df_data, mutants in data_frames:
+        df = label_data(samples, df_data, labelings, mutants)
+        if not mutants:
+            # Only rows confirmed by our classification keep a validated color
+            df['validated'] = df['index'].isin(validated)
+            df['scale_color_validated'] = df['scale_color'].where(
+                df['validated'])
+        rv.append(df)
+    return tuple(rv)
+
+
+def pair_mutants(wt_data, mutant_data):
+    """ Pairs the scales of every mutant variant with the wilde type scales of the same species and color before the mutation
+            Every species/genotype/color is indexed once and the 'pre->post' color transitions are resolved together by joins
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'wt_data' : The Wilde Type Data for our study (re-indexed with color)
+            ('Pandas.DataFrame' Object Class) - 'mutant_data' : The Mutant Data for our study (re-indexed with color)
+        Outputs:
+            (Tuple) - 'mutants', 'unmatched' : (List of 'Pandas.DataFrame' Object Classes) the wt and mutant scales of every transition
+                                               and ('Pandas.DataFrame' Object Class) the transitions without wt scales of the color before the mutation
+    """
+    # Every mutant index of every species, species by species in the order they appear
+    trans = pd.DataFrame({'species': mutant_data['species'].astype(object),
+                          'index': mutant_data['index'].astype(object)}).drop_duplicates()
+    trans = trans.iloc[np.argsort(pd.factorize(
+        trans['species'])[0], kind='stable')].reset_index(drop=True)
+    # <species> <genotype> <color_pre>-><color_post>
+    parts = trans['index'].str.split(' ', expand=True).reindex(
+        columns=[0, 1, 2]).astype(object)
+    shift = parts[2].str.split('->', expand=True).reindex(
+        columns=[0, 1]).astype(object)
+    trans['genotype'], trans['color_pre'], trans['color_post'] = parts[1], shift[0], shift[1]
+
+    # The wt scale colors and the colors ending their index
+    wt = pd.DataFrame({'species': wt_data['species'].astype(object),
+                       'scale_color': wt_data['scale_color'].astype(object),
+                       'wt_index': wt_data['index'].astype(object)})
+    wt_colors = wt[['species', 'scale_color']].drop_duplicates()
+    all_wt_indexes = wt[['species', 'wt_index']].drop_duplicates()
+    all_wt_indexes['color_pre'] = all_wt_indexes['wt_index'].str.split(
+        ' ').str[-1]
+    # The first wt index ending in the color is the one we match
+    wt_indexes = all_wt_indexes.drop_duplicates(['species', 'color_pre'])
+
+    # Match the color before the mutation to the wt scale color first, then to the color ending a wt index
+    trans = trans.merge(wt_colors.rename(columns={'scale_color': 'color_pre'}).assign(by_color=True),
+                        on=['species', 'color_pre'], how='left')
+    trans = trans.merge(wt_indexes, on=['species', 'color_pre'], how='left')
+    trans['by_color'] = trans['by_color'].fillna(False).astype(bool)
+
+    # Row positions of every group we need, each grouped in one pass
+    wt_by_color = get_group_index(wt_data).get(wt_data, ('species', 'scale_color'))
+    wt_by_index = get_group_index(wt_data).get(wt_data, ('index',))
+    mutant_by_color = get_group_index(mutant_data).get(
+        mutant_data, ('species', 'genotype', 'scale_color_post'))
+    none = np.zeros(0, dtype=np.intp)
+
+    mutants, unmatched = [], []
+    for t in trans.itertuples(index=False):
+        if t.by_color:
+            wt_rows = wt_by_color.get((t.species, t.color_pre), none)
+        elif isinstance(t.wt_index, str):
+            wt_rows = wt_by_index.get(t.wt_index, none)
+        else:
+            unmatched.append(t)
+            continue
+        mutant_rows = mutant_by_color.get(
+            (t.species, t.genotype, t.color_post), none)
+        # Concat Data
+        mutants.append(pd.concat([take_rows(wt_data, wt_rows),
+                                  take_rows(mutant_data, mutant_rows)]))
+
+    # Make sure that their color field description is valid
+    for i, df_mutation in enumerate(mutants):
+        mutants[i] = df_mutation.assign(scale_color=df_mutation['scale_color'].astype(
+            object).fillna(df_mutation['scale_color_post'].astype(object)))
+
+    unmatched = pd.DataFrame(unmatched, columns=trans.columns)[
+        ['species', 'index', 'genotype', 'color_pre', 'color_post']]
+    # What we could have matched the color to
+    candidates = {}
+    for sp, color in pd.concat([all_wt_indexes[['species', 'color_pre']],
+                                wt_colors.rename(columns={'scale_color': 'color_pre'})]).itertuples(index=False):
+        candidates.setdefault(sp, []).append(color)
+    unmatched['wt_colors'] = [candidates.get(sp, [])
+                              for sp in unmatched['species']]
+    return mutants, unmatched
+
+
 def gen_mutants(wt_data, mutant_data):
     """ Returns DataFrames of species which have a mutant variant in our Study
 
@@ -451,54 +1098,13 @@ def gen_mutants(wt_data, mutant_data):
             ('Pandas.DataFrame' Object Class) - 'wt_data' : The Wilde Type Data for our study
             ('Pandas.DataFrame' Object Class) - 'mutant_data' : The Mutant Data for our study
         Outputs:
-            (List of 'Pandas.DataFrame' Object Classes) - 'mutants' : A list of dataframes segmented by the scale data pre and post mutation
-    """
-    mutant_list = []
-    # find the corresponding species contained within mutant data
-    for m_sp in mutant_data['species'].unique():
-        # Get the mutant and wt variant of all scale data we have for this species
-        df_sp_mutant = mutant_data.loc[mutant_data['species'] == m_sp]
-        df_sp_wt = wt_data.loc[wt_data['species'] == m_sp]
-        # for this species how many mutant variants do we have
-        mutant_keys = df_sp_mutant['index'].unique()
-        for mkey in mutant_keys:
-            _, mutated_gene, color_shift = mkey.split(' ')
-            # Find the mutation we are looking for
-            df_geno_mutant = df_sp_mutant.loc[df_sp_mutant['genotype']
-                                              == mutated_gene]
-            # cross-ref colors
-            color_pre, color_post = color_shift.split('->')
-            # Get the mutated scales
-            df_mutant_scales = df_geno_mutant.loc[df_geno_mutant['scale_color_post'] == color_post]
-            # Get the original scales
-            wt_indexes, wt_colors = [i for i in df_sp_wt['index'].unique()], [
-                i for i in df_sp_wt['scale_color'].unique()]
-            wt_index_colors = [i.split(' ')[-1] for i in wt_indexes]
-
-            # Find the wt scale matching color_pre with values in wt_indexes and wt_colors
-            if color_pre in wt_colors:
-                df_wt_scales = df_sp_wt.loc[df_sp_wt['scale_color']
-                                            == color_pre]
-
-            elif color_pre in wt_index_colors:
-                correct_index = wt_indexes[wt_index_colors.index(color_pre)]
-                # match the indexes
-                df_wt_scales = df_sp_wt.loc[df_sp_wt['index'] == correct_index]
-            else:
-                print('NOT WORKING: ', mkey)
-                print('Could not match the color : ', color_pre,
-                      ' in : ', wt_index_colors + wt_colors)
-                df_wt_scales = None
-
-            if type(df_wt_scales) != type(None):
-                # Concat Data
-                df_mutation = pd.concat([df_wt_scales, df_mutant_scales])
-                mutant_list.append(df_mutation)
-    # Make sure that their color field description is valid
-    for df_mutation in mutant_list:
-        df_mutation.loc[df_mutation["scale_color"].isnull(
-        ), 'scale_color'] = df_mutation["scale_color_post"]
-
+            (List of 'Pandas.DataFrame' Object Classes) - 'mutants' : A list of dataframes segmented by the scale data pre and post mutation,
+                                                                      every mutation that can't be paired is reported as a warning (see 'pair_mutants')
+    """
+    mutant_list, unmatched = pair_mutants(wt_data, mutant_data)
+    for t in unmatched.itertuples(index=False):
+        warnings.warn(f"Could not match the color '{t.color_pre}' of the mutation '{t.index}' in : {list(t.wt_colors)}",
+                      stacklevel=2)
     return mutant_list
 
 
@@ -0,0 +1,867 @@
+""" feature_search.py
+
+Scores Subsets of the Morphometric Features by how much of their variance a PCA explains
+
+    SCALE PROJECT -- KRONFORST LABORATORY AT THE UNIVERSITY OF CHICAGO
+                  -- ALL RIGHTS RESERVED
+
+"""
+import time
+import weakref
+import warnings
+import itertools
+from collections import OrderedDict
+import numpy as np
+from scale_data import dataset_fingerprint, take_rows
+
+# The number of subsets whose covariance matrices are built and decomposed at once
+SUBSET_CHUNK_SIZE = 4096
+# The most floats of summed statistics a SubsetScorer builds at once
+STATS_MAX_SIZE = 2**24
+# The most bytes of row bits combined at once when counting the rows of many subsets
+BITS_CHUNK_BYTES = 2**24
+# The number of complete-case matrices kept by each MissingnessIndex, the least recently used one is forgotten first
+MATRIX_CACHE_SIZE = 64
+# The number of best feature sets of a search whose stability is measured by the bootstrap
+BOOTSTRAP_CANDIDATES = 64
+# The number of set bits of every byte
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+class MissingnessIndex:
+    """
+        Which rows of one DataFrame have a value in each column, one bit per row packed into bytes.
+        The complete rows of any set of columns are the bitwise AND of their bits and their number is its popcount,
+        so the rows every feature subset keeps are known before any of them is fitted.
+        The bits of a column and the complete-case matrices are kept with the fingerprint of the columns they were
+        read from, and read again whenever the contents of those columns change.
+
+        attr :: self.n_rows - The number of rows in the indexed DataFrame
+        attr :: self.present - Dictionary of {column : (fingerprint of the column, numpy.ndarray of uint8 with the bit of every row that has a value set)}
+        attr :: self.matrices - OrderedDict of {(columns) : (fingerprint of the columns, complete rows, their features)} of the most recent complete-case matrices
+    """
+
+    def __init__(self, df):
+        """ MissingnessIndex Constructor
+
+            param :: 'df' - Pandas.DataFrame Type Object Class of our morphometric measurements
+        """
+        self.n_rows = len(df)
+        self.present = {}
+        self.matrices = OrderedDict()
+
+    def bits(self, df, columns):
+        """ Returns the packed row bits of every column, packing the columns not seen yet or changed since
+
+            Inputs:
+                ('Pandas.DataFrame' Object Class) - 'df' : The indexed DataFrame
+                (List of Strings) - 'columns' : The columns
+            Outputs:
+                (numpy.ndarray) - (n_columns, n_bytes) uint8 row bits of the columns
+        """
+        for c in columns:
+            fingerprint = dataset_fingerprint(df, [c])
+            if c not in self.present or self.present[c][0] != fingerprint:
+                self.present[c] = fingerprint, np.packbits(df[c].notna().to_numpy())
+        return np.stack([self.present[c][1] for c in columns]).reshape(len(columns), -1)
+
+    def complete_rows(self, df, columns):
+        """ Returns the positions of the rows with a value in every column
+
+            Inputs:
+                ('Pandas.DataFrame' Object Class) - 'df' : The indexed DataFrame
+                (List of Strings) - 'columns' : The columns
+            Outputs:
+                (numpy.ndarray) - The sorted row positions
+        """
+        rows = np.bitwise_and.reduce(self.bits(df, columns), axis=0)
+        return np.flatnonzero(np.unpackbits(rows, count=self.n_rows))
+
+    def row_counts(self, df, subsets, field):
+        """ Returns the number of complete rows of each subset of features with its target, without fitting anything
+
+            Inputs:
+                ('Pandas.DataFrame' Object Class) - 'df' : The indexed DataFrame
+                (List of Lists of Strings) - 'subsets' : Feature subsets all of the same size
+                (String) - 'field' : The target variable every row also needs
+            Outputs:
+                (numpy.ndarray) - The number of complete rows of each subset
+        """
+        if not len(subsets):
+            return np.zeros(0, dtype=np.int64)
+        features = list(dict.fromkeys(itertools.chain.from_iterable(subsets)))
+        bits = self.bits(df, features + [field])
+        target, bits = bits[-1], bits[:-1]
+        at = {f: i for i, f in enumerate(features)}
+        idx = np.array([[at[f] for f in s] for s in subsets],
+                       dtype=np.intp).reshape(len(subsets), -1)
+
+        rv = np.zeros(len(idx), dtype=np.int64)
+        chunk = max(1, BITS_CHUNK_BYTES // max(1, idx.shape[1] * bits.shape[1]))
+        for start in range(0, len(idx), chunk):
+            rows = np.bitwise_and.reduce(bits[idx[start:start + chunk]], axis=1) & target
+            rv[start:start + chunk] = POPCOUNT[rows].sum(axis=1)
+        return rv
+
+    def complete_case(self, df, features, field):
+        """ Returns the rows of 'df' with every feature and the target, kept for the next time they are asked for
+
+            Inputs:
+                ('Pandas.DataFrame' Object Class) - 'df' : The indexed DataFrame
+                (List of Strings) - 'features' : The morphometric features
+                (String) - 'field' : The target variable
+            Outputs:
+                (Tuple) - 'df_n', 'X' : the complete rows of the features and target, their features, or (0, 0) if there are none
+        """
+        r = list(features) + [field]
+        key = tuple(r)
+        fingerprint = dataset_fingerprint(df, dict.fromkeys(r))
+        entry = self.matrices.get(key)
+        if entry is None or entry[0] != fingerprint:
+            rows = self.complete_rows(df, r)
+            entry = fingerprint, 0, 0
+            if len(rows):
+                # 'df[r]' is a new DataFrame so the kept matrix never changes with 'df'
+                df_n = take_rows(df[r], rows)
+                entry = fingerprint, df_n, df_n[list(features)]
+            self.matrices[key] = entry
+            # Forget the least recently used matrix once the cache is full
+            if len(self.matrices) > MATRIX_CACHE_SIZE:
+                self.matrices.popitem(last=False)
+        self.matrices.move_to_end(key)
+        return entry[1], entry[2]
+
+
+# The MissingnessIndex of every DataFrame we have resized that still exists
+_MISSINGNESS_INDEXES = {}
+
+
+def get_missingness_index(df):
+    """ Returns the MissingnessIndex of a DataFrame, building it the first time
+            What it keeps is checked against the contents of the columns every time they are asked for
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The DataFrame of our morphometric measurements
+        Outputs:
+            (MissingnessIndex Object Class) - The row bits of every column of 'df' asked for so far
+    """
+    key = id(df)
+    entry = _MISSINGNESS_INDEXES.get(key)
+    if entry is None or entry[0]() is not df or entry[1].n_rows != len(df):
+        # Forget the index once the DataFrame is garbage collected
+        ref = weakref.ref(
+            df, lambda _, key=key: _MISSINGNESS_INDEXES.pop(key, None))
+        entry = ref, MissingnessIndex(df)
+        _MISSINGNESS_INDEXES[key] = entry
+    return entry[1]
+
+
+class SubsetScorer:
+    """
+        Covariance statistics of the morphometric features of one DataFrame from which the PCA of any
+        subset of features can be scored without fitting it. Rows are grouped by which features they are
+        missing so each subset only sums the statistics of the rows it keeps (its complete cases).
+        When there are too many patterns to keep their cross-products each subset sums its own rows instead.
+
+        attr :: self.features - The features (columns) the statistics are kept for
+        attr :: self.correlation - Score the PCA of the standardized features (correlation) instead of the covariance
+        attr :: self.missing - numpy.ndarray (n_patterns, n_features) of which features each missingness pattern lacks
+        attr :: self.counts - numpy.ndarray of the number of rows of each pattern
+        attr :: self.sums - numpy.ndarray (n_patterns, n_features) of the sum of the centered values of each pattern
+        attr :: self.cross - numpy.ndarray (n_patterns, n_features * n_features) of the cross-products of each pattern or None
+        attr :: self.X, self.pattern - The centered rows (missing values as 0) and the pattern of each row, summed by the bootstrap
+                                       and by every subset when 'self.cross' is None
+    """
+
+    def __init__(self, df, features, field, correlation=False):
+        """ SubsetScorer Constructor
+
+            param :: 'df' - Pandas.DataFrame Type Object Class of our morphometric measurements
+            param :: 'features' - List of the column names of the features that subsets are drawn from
+            param :: 'field' - The target variable, rows where it is missing are never used
+            param :: 'correlation' - Boolean, score on the correlation matrix instead of the covariance matrix
+        """
+        self.features = list(features)
+        self.correlation = correlation
+        # Rows without a target are dropped by every subset
+        X = df.loc[df[field].notna().to_numpy(), self.features].to_numpy(dtype=float)
+        missing = np.isnan(X)
+        # Center on the mean of each feature so the sums of squares stay small
+        n_seen = (~missing).sum(axis=0)
+        center = np.where(missing, 0, X).sum(axis=0) / np.maximum(n_seen, 1)
+        X = np.where(missing, 0, X - center)
+
+        self.missing, inverse = np.unique(
+            missing, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        n, d = len(self.missing), len(self.features)
+        self.counts = np.bincount(inverse, minlength=n)
+        self.sums = np.zeros((n, d))
+        np.add.at(self.sums, inverse, X)
+        self.cross, self.X, self.pattern = None, X, inverse
+        if n * d * d > STATS_MAX_SIZE:
+            return
+        self.cross = np.zeros((n, d * d))
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.cumsum(self.counts)[:-1]
+        for p, rows in enumerate(np.split(order, bounds)):
+            x = X[rows]
+            self.cross[p] = (x.T @ x).ravel()
+
+    def positions(self, subsets):
+        """ Returns the column positions of the features of each subset
+
+            Inputs:
+                (List of Lists of Strings) - 'subsets' : Feature subsets all of the same size
+            Outputs:
+                (numpy.ndarray) - (n_subsets, subset size) positions into 'self.features'
+        """
+        if not len(subsets):
+            return np.zeros((0, 0), dtype=np.intp)
+        at = {f: i for i, f in enumerate(self.features)}
+        return np.array([[at[f] for f in s] for s in subsets], dtype=np.intp).reshape(len(subsets), -1)
+
+    def complete_patterns(self, idx):
+        """ Which missingness patterns have every feature of each subset
+
+            Inputs:
+                (numpy.ndarray) - 'idx' : (n_subsets, k) positions of the features of each subset
+            Outputs:
+                (numpy.ndarray) - (n_subsets, n_patterns) Boolean matrix of the patterns each subset keeps
+        """
+        member = np.zeros((len(idx), len(self.features)))
+        np.put_along_axis(member, idx, 1, axis=1)
+        return member @ self.missing.T == 0
+
+    def row_counts(self, subsets):
+        """ Returns the number of complete rows of each subset
+
+            Inputs:
+                (List of Lists of Strings) - 'subsets' : Feature subsets all of the same size
+            Outputs:
+                (numpy.ndarray) - The number of rows each subset would fit its PCA on
+        """
+        return self.complete_patterns(self.positions(subsets)) @ self.counts
+
+    def covariances(self, idx):
+        """ Returns the covariance (or correlation) matrix of each subset over its complete rows
+
+            Inputs:
+                (numpy.ndarray) - 'idx' : (n_subsets, k) positions of the features of each subset
+            Outputs:
+                (Tuple) - (numpy.ndarray) stacked (n_subsets, k, k) matrices, (numpy.ndarray) number of rows of each subset
+        """
+        d, k = len(self.features), idx.shape[1]
+        keep = self.complete_patterns(idx)
+        n = keep @ self.counts
+        sums = np.take_along_axis(keep @ self.sums, idx, axis=1)
+        flat = (idx[:, :, None] * d + idx[:, None, :]).reshape(len(idx), -1)
+        if self.cross is not None:
+            # Sum only the cross-products the subsets use over the patterns they keep
+            used, at = np.unique(flat, return_inverse=True)
+            cross = (keep @ self.cross[:, used])[np.arange(len(idx))[:, None],
+                                                 at.reshape(flat.shape)]
+        else:
+            # Every row counts towards the subsets that keep its pattern
+            x = self.X[:, idx] * keep[:, self.pattern].T[:, :, None]
+            cross = np.einsum('rsi,rsj->sij', x, x).reshape(flat.shape)
+        return self.matrices(cross.reshape(-1, k, k), sums, n), n
+
+    def matrices(self, cross, sums, n):
+        """ Turns the summed statistics of the rows of each subset into its covariance (or correlation) matrix
+
+            Inputs:
+                (numpy.ndarray) - 'cross' : (..., k, k) sums of the cross-products of the centered rows
+                (numpy.ndarray) - 'sums' : (..., k) sums of the centered rows
+                (numpy.ndarray) - 'n' : (...) number of rows
+            Outputs:
+                (numpy.ndarray) - (..., k, k) matrices, undefined (nan or inf) where there are fewer than 2 rows
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = sums / n[..., None]
+            cov = cross - n[..., None, None] * \
+                mean[..., :, None] * mean[..., None, :]
+            cov /= (n - 1)[..., None, None]
+            if self.correlation:
+                scale = np.sqrt(np.diagonal(cov, axis1=-2, axis2=-1))
+                cov /= scale[..., :, None] * scale[..., None, :]
+        return cov
+
+    def ratios(self, cov, n, n_components):
+        """ Returns the fraction of the variance of each matrix on its first 'n_components' PCA axes
+
+            Inputs:
+                (numpy.ndarray) - 'cov' : (n_subsets, k, k) matrices
+                (numpy.ndarray) - 'n' : The number of rows of each matrix
+                (Int) - 'n_components' : The number of PCA axes
+            Outputs:
+                (numpy.ndarray) - The fraction of each matrix, 0.0 where a PCA can't be made and nan where the matrix is undefined
+        """
+        ratio = np.zeros(len(cov))
+        # A PCA needs at least as many rows and features as components
+        ok = (n >= n_components) & (cov.shape[-1] >= n_components)
+        if not ok.any():
+            return ratio
+        # Eigenvalues come back in ascending order, the last ones are the PCA axes
+        eig = np.linalg.eigvalsh(np.nan_to_num(cov[ok]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            part = eig[:, -n_components:].sum(axis=1) / eig.sum(axis=1)
+        # Matrices with undefined entries have no defined variance ratio
+        part[np.isnan(cov[ok]).any(axis=(1, 2))] = np.nan
+        ratio[ok] = part
+        return ratio
+
+    def score_positions(self, idx, n_components):
+        """ Scores every subset given by its feature positions (see 'score')
+
+            Inputs:
+                (numpy.ndarray) - 'idx' : (n_subsets, k) positions of the features of each subset
+                (Int) - 'n_components' : The number of PCA axes
+            Outputs:
+                (Tuple) - (numpy.ndarray) the score of each subset, (numpy.ndarray) the number of rows of each subset
+        """
+        scores, counts = np.zeros(len(idx)), np.zeros(len(idx), dtype=int)
+        k = idx.shape[1]
+        chunk = max(1, min(SUBSET_CHUNK_SIZE, STATS_MAX_SIZE // max(1, k * k * len(self.missing))))
+        for start in range(0, len(idx), chunk):
+            part = slice(start, start + chunk)
+            cov, n = self.covariances(idx[part])
+            counts[part] = n
+            scores[part] = self.ratios(cov, n, n_components)
+        return np.array([round(s * 100, 2) for s in scores]), counts
+
+    def resample_weights(self, start, size, seed=0):
+        """ Returns how many times each row is drawn in resamples 'start' to 'start + size' of a bootstrap
+                every resample only depends on the seed and its number so chunks of resamples can be drawn in any order
+
+            Inputs:
+                (Int) - 'start' : The number of the first resample
+                (Int) - 'size' : The number of resamples
+                (Int) - 'seed' : Seed of the bootstrap
+            Outputs:
+                (numpy.ndarray) - (size, n_rows) number of draws of every row
+        """
+        n_rows = len(self.X)
+        rng = np.random.default_rng([seed, start])
+        draws = rng.integers(0, n_rows, (size, n_rows)) + \
+            (np.arange(size) * n_rows)[:, None]
+        return np.bincount(draws.ravel(), minlength=size * n_rows).reshape(size, n_rows).astype(float)
+
+    def bootstrap(self, idx, n_components, n_boot, seed=0):
+        """ Scores every subset on 'n_boot' resamples of the rows drawn with replacement, all subsets on the same resamples
+                A resample is how many times each row is drawn, so the summed statistics of every subset on every resample
+                are one matrix product of those counts with what each row adds to each subset. All the matrices are then
+                decomposed at once, no PCA is fit.
+
+            Inputs:
+                (numpy.ndarray) - 'idx' : (n_subsets, k) positions of the features of each subset
+                (Int) - 'n_components' : The number of PCA axes
+                (Int) - 'n_boot' : The number of resamples
+                (Int) - 'seed' : Seed of the resamples
+            Outputs:
+                (Tuple) - (numpy.ndarray) (n_boot, n_subsets) score of each subset on each resample (see 'score'),
+                          (numpy.ndarray) (n_boot, n_subsets) number of rows of each subset on each resample
+        """
+        n_rows, (n_sets, k) = len(self.X), idx.shape
+        scores = np.zeros((n_boot, n_sets))
+        counts = np.zeros((n_boot, n_sets), dtype=np.int64)
+        width = 1 + k + k * k
+        set_chunk = max(1, STATS_MAX_SIZE // max(1, n_rows * width))
+        # The draws of a chunk of resamples are held as integers, their counts as floats
+        boot_chunk = max(1, STATS_MAX_SIZE // max(1, 4 * n_rows))
+        for s in range(0, n_sets, set_chunk):
+            part = idx[s:s + set_chunk]
+            m = len(part)
+            # What each row adds to each subset: its count, values and cross-products, nothing if it misses a feature
+            keep = self.complete_patterns(part)[:, self.pattern].T
+            x = self.X[:, part] * keep[:, :, None]
+            stats = np.concatenate([keep[:, :, None], x, (x[:, :, :, None] * x[:, :, None, :]).reshape(n_rows, m, k * k)],
+                                   axis=2).reshape(n_rows, -1)
+            for b in range(0, n_boot, boot_chunk):
+                weights = self.resample_weights(b, min(boot_chunk, n_boot - b), seed)
+                total = (weights @ stats).reshape(len(weights), m, width)
+                n = np.rint(total[:, :, 0]).astype(np.int64)
+                cov = self.matrices(total[:, :, 1 + k:].reshape(len(weights), m, k, k), total[:, :, 1:1 + k], n)
+                ratio = self.ratios(cov.reshape(-1, k, k), n.ravel(), n_components)
+                scores[b:b + len(weights), s:s + m] = np.round(ratio * 100, 2).reshape(n.shape)
+                counts[b:b + len(weights), s:s + m] = n
+        return scores, counts
+
+    def score(self, subsets, n_components):
+        """ Scores every subset by the percent of its variance explained by the first 'n_components' PCA axes
+                the same score as round(sum(PCA(n_components).fit(X).explained_variance_ratio_) * 100, 2)
+
+            Inputs:
+                (List of Lists of Strings) - 'subsets' : Feature subsets all of the same size
+                (Int) - 'n_components' : The number of PCA axes
+            Outputs:
+                (Tuple) - (numpy.ndarray) the score of each subset, 0.0 where a PCA can't be made,
+                          (numpy.ndarray) the number of rows of each subset, subsets without rows have no score
+        """
+        return self.score_positions(self.positions(subsets), n_components)
+
+
+def score_feature_sets(df, feature_sets, field, n_components, correlation=False, min_rows=1):
+    """ Scores every feature set of one size by how much variance its PCA explains in one batched pass
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df': The DataFrame of our morphometric measurements
+            (List of Lists of Strings) - 'feature_sets': The feature subsets to score, all of the same size
+            (String) - 'field': What is the target variable in the dataset
+            (Int) - 'n_components': The number of PCA axes the subsets are scored on
+            (Boolean) - 'correlation': Score the PCA of the standardized features
+            (Int) - 'min_rows': The fewest complete rows a feature set needs to be scored
+        Outputs:
+            (List of Tuples) - (feature set, score) in the order of 'feature_sets', sets with fewer than 'min_rows' complete rows are left out
+    """
+    # Subsets with too few rows are dropped before any covariance is built
+    counts = get_missingness_index(df).row_counts(df, feature_sets, field)
+    feature_sets = [list(fset) for fset, n in zip(feature_sets, counts)
+                    if n >= max(min_rows, 1)]
+    if not feature_sets:
+        return []
+    features = list(dict.fromkeys(itertools.chain.from_iterable(feature_sets)))
+    scorer = SubsetScorer(df, features, field, correlation)
+    scores, _ = scorer.score(feature_sets, n_components)
+    return list(zip(feature_sets, scores))
+
+
+# The ways 'search_feature_sets' can look for the best feature set
+SEARCH_STRATEGIES = ['exact', 'stream', 'forward', 'backward', 'beam', 'branch_and_bound']
+
+
+class SearchBudget:
+    """
+        How many feature sets a search may score and for how long, a search out of budget returns the best set found so far.
+
+        attr :: self.max_evals - The most feature sets to score or None for no limit
+        attr :: self.max_time - The most seconds to search for or None for no limit
+        attr :: self.evals - The number of feature sets scored so far
+        attr :: self.start - When the search started (time.perf_counter)
+    """
+
+    def __init__(self, max_evals=None, max_time=None):
+        """ SearchBudget Constructor
+
+            param :: 'max_evals' - Int or None, the most feature sets to score
+            param :: 'max_time' - Float or None, the most seconds to search for
+        """
+        self.max_evals = max_evals
+        self.max_time = max_time
+        self.evals = 0
+        self.start = time.perf_counter()
+
+    def remaining(self):
+        """ Returns how many more feature sets can be scored (None for no limit), 0 once the time is up
+        """
+        if self.max_time is not None and time.perf_counter() - self.start >= self.max_time:
+            return 0
+        if self.max_evals is None:
+            return None
+        return max(0, self.max_evals - self.evals)
+
+    def exhausted(self):
+        """ Is the budget used up
+        """
+        return self.remaining() == 0
+
+
+class FeatureSearch:
+    """
+        Searches the feature sets of one size of a DataFrame for the one whose PCA explains the most variance.
+        Every strategy scores sets through one SubsetScorer and keeps the first set with the highest score,
+        the same one 'max' picks from the scores of every set in the order of 'itertools.combinations'.
+
+        attr :: self.scorer - The SubsetScorer of the DataFrame
+        attr :: self.k - The number of features in a set
+        attr :: self.n_components - The number of PCA axes the sets are scored on
+        attr :: self.min_rows - The fewest complete rows a set needs to be scored
+        attr :: self.budget - The SearchBudget of the search
+        attr :: self.best - (positions, score) of the best set found so far or None
+        attr :: self.partial - (positions, score) of the best of the largest sets smaller than 'self.k' scored so far or None
+        attr :: self.n_top - The number of best sets kept in 'self.top'
+        attr :: self.top - List of (positions, score) of the 'self.n_top' best sets found so far, best first
+        attr :: self.variance_sums - Dictionary of {r : the sum of the r largest variances from each position on}
+    """
+
+    def __init__(self, scorer, k, n_components, min_rows=1, budget=None, n_top=1):
+        """ FeatureSearch Constructor
+
+            param :: 'scorer' - SubsetScorer Type Object Class of the DataFrame to search
+            param :: 'k' - Int, the number of features in a set
+            param :: 'n_components' - Int, the number of PCA axes the sets are scored on
+            param :: 'min_rows' - Int, the fewest complete rows a set needs to be scored
+            param :: 'budget' - SearchBudget Type Object Class or None for no limits
+            param :: 'n_top' - Int, the number of best sets kept
+        """
+        self.scorer = scorer
+        self.k = k
+        self.n_components = n_components
+        self.min_rows = max(min_rows, 1)
+        self.budget = budget or SearchBudget()
+        self.best = None
+        self.partial = None
+        self.n_top = n_top
+        self.top = []
+        self.variance_sums = {}
+
+    def evaluate(self, idx, n_components=None):
+        """ Scores sets of features given by their positions, counting them against the budget
+
+            Inputs:
+                (numpy.ndarray) - 'idx' : (n_sets, size) sorted positions of the features of each set
+                (Int or None) - 'n_components' : The number of PCA axes, if None then 'self.n_components'
+            Outputs:
+                (numpy.ndarray) - The score of each set, -inf where it has too few rows or no defined score
+        """
+        idx = np.asarray(idx, dtype=np.intp).reshape(len(idx), -1)
+        self.budget.evals += len(idx)
+        scores, counts = self.scorer.score_positions(
+            idx, n_components or self.n_components)
+        # Only sets of the full size can be the best set
+        value = np.where((counts >= self.min_rows) & ~np.isnan(scores), scores, -np.inf)
+        if idx.shape[1] == self.k and n_components in (None, self.n_components):
+            for s, score in zip(idx, value):
+                if score > -np.inf and (self.best is None or score > self.best[1]):
+                    self.best = tuple(int(i) for i in s), score
+            if self.n_top > 1:
+                self.keep_top((tuple(int(i) for i in s), score) for s, score in zip(idx, value) if score > -np.inf)
+        elif 0 < idx.shape[1] < self.k and len(idx):
+            # The set a search out of budget is completed from
+            i = int(np.argmax(value))
+            size = len(self.partial[0]) if self.partial is not None else 0
+            if idx.shape[1] > size or (idx.shape[1] == size and value[i] > self.partial[1]):
+                self.partial = tuple(int(f) for f in idx[i]), value[i]
+        return value
+
+    def evaluate_within_budget(self, sets, n_components=None):
+        """ Scores sets in chunks for as long as the budget lasts, a chunk builds about SUBSET_CHUNK_SIZE covariance entries
+
+            Inputs:
+                (List of Tuples) - 'sets' : Sorted feature positions of sets of the same size
+                (Int or None) - 'n_components' : The number of PCA axes, if None then 'self.n_components'
+            Outputs:
+                (Tuple) - (List of Tuples) the sets scored before the budget ran out, the first ones of 'sets',
+                          (numpy.ndarray) their scores as given by 'evaluate'
+        """
+        chunk = max(1, SUBSET_CHUNK_SIZE // len(sets[0]) ** 2) if sets else 1
+        scores = []
+        done = 0
+        while done < len(sets):
+            size = self.budget.remaining()
+            if size == 0:
+                break
+            size = min(chunk, size or chunk)
+            scores.append(self.evaluate(sets[done:done + size], n_components))
+            done += size
+        return sets[:done], np.concatenate(scores) if scores else np.zeros(0)
+
+    def keep_top(self, entries):
+        """ Adds (positions, score) entries to 'self.top', keeping the first found of sets with the same score first
+        """
+        seen = dict(self.top)
+        for positions, score in entries:
+            seen.setdefault(positions, score)
+        self.top = sorted(seen.items(), key=lambda e: -e[1])[:self.n_top]
+
+    def exhaustive(self, combinations, limit=True):
+        """ Scores sets from an iterable of feature positions in chunks until they or the budget run out
+
+            Inputs:
+                (Iterable of Tuples) - 'combinations' : The sets to score
+                (Boolean) - 'limit' : Stop once the budget is used up
+            Outputs:
+                (None)
+        """
+        combinations = iter(combinations)
+        while True:
+            size = self.budget.remaining() if limit else None
+            if size == 0:
+                return
+            chunk = list(itertools.islice(combinations, min(
+                SUBSET_CHUNK_SIZE, size or SUBSET_CHUNK_SIZE)))
+            if not chunk:
+                return
+            self.evaluate(chunk)
+
+    def exact(self):
+        """ Scores every set, a search with a budget must use 'stream' instead
+        """
+        d = len(self.scorer.features)
+        self.exhaustive(itertools.combinations(range(d), self.k), limit=False)
+
+    def stream(self):
+        """ Scores every set as 'itertools.combinations' yields them, stopping early once the budget is used up
+        """
+        d = len(self.scorer.features)
+        self.exhaustive(itertools.combinations(range(d), self.k))
+
+    def partial_components(self, size):
+        """ The number of PCA axes a set of 'size' features is ranked on while it is being grown
+                a set no larger than the number of axes is always fully explained, so smaller sets are ranked on fewer axes
+        """
+        if size >= self.k or size > self.n_components:
+            return self.n_components
+        return max(1, size - 1)
+
+    def grow(self, sets, width):
+        """ Adds every other feature to each set and keeps the 'width' best larger sets
+
+            Inputs:
+                (List of Tuples) - 'sets' : Sorted feature positions of sets of the same size
+                (Int) - 'width' : The number of sets to keep
+            Outputs:
+                (List of Tuples) - The best larger sets, best first
+        """
+        d = len(self.scorer.features)
+        candidates = sorted({tuple(sorted(s + (f,)))
+                             for s in sets for f in range(d) if f not in s})
+        if not candidates:
+            return []
+        size = len(candidates[0])
+        candidates, scores = self.evaluate_within_budget(candidates, self.partial_components(size))
+        if not candidates:
+            return []
+        order = np.argsort(-scores, kind='stable')[:width]
+        return [candidates[i] for i in order if scores[i] > -np.inf] or [candidates[order[0]]]
+
+    def beam(self, width=8):
+        """ Grows the 'width' best sets one feature at a time from the best pairs
+        """
+        d = len(self.scorer.features)
+        if self.k <= 2 or d <= 2:
+            return self.stream()
+        sets = self.grow([(f,) for f in range(d)], width)
+        while sets and len(sets[0]) < self.k and not self.budget.exhausted():
+            sets = self.grow(sets, width)
+
+    def forward(self):
+        """ Greedy forward selection, the beam search of a single set
+        """
+        self.beam(width=1)
+
+    def backward(self):
+        """ Greedy backward elimination, starting from every feature drops the one whose removal scores best
+                while no smaller set can be scored the feature whose removal leaves the most complete rows is dropped,
+                if the budget runs out first (even part way through a step, among the sets scored so far) the features
+                loading the most on the PCA axes of the set are kept and that set is scored past the budget
+        """
+        s = tuple(range(len(self.scorer.features)))
+        while len(s) > self.k and not self.budget.exhausted():
+            smaller = [s[:i] + s[i + 1:] for i in range(len(s))]
+            scored, scores = self.evaluate_within_budget(smaller)
+            if np.isfinite(scores).any():
+                s = scored[int(np.argmax(scores))]
+            else:
+                counts = self.scorer.complete_patterns(
+                    np.array(smaller)) @ self.scorer.counts
+                s = smaller[int(np.argmax(counts))]
+        if len(s) > self.k:
+            cov, _ = self.scorer.covariances(np.array([s]))
+            value, vector = np.linalg.eigh(np.nan_to_num(cov[0]))
+            weight = (vector[:, -self.n_components:] ** 2 *
+                      value[-self.n_components:]).sum(axis=1)
+            s = tuple(sorted(s[i] for i in np.argsort(-weight, kind='stable')[:self.k]))
+        if self.best is None:
+            self.evaluate([s])
+
+    def finish(self):
+        """ Completes 'self.partial' (or the empty set) into a full size set once the budget ran out before any full
+                size set could be scored, so a search out of budget still returns a set. The features keeping the most
+                complete rows are added one at a time, ties going to the largest variance, without scoring anything
+                until the completed set, which is scored past the budget.
+        """
+        d = len(self.scorer.features)
+        if self.best is not None or d < self.k:
+            return
+        var, _ = self.scorer.covariances(np.arange(d)[:, None])
+        var = np.nan_to_num(var.ravel(), nan=-np.inf)
+        s = self.partial[0] if self.partial is not None else ()
+        while len(s) < self.k:
+            rest = np.array([f for f in range(d) if f not in s], dtype=np.intp)
+            larger = np.sort(np.column_stack(
+                [np.tile(np.array(s, dtype=np.intp), (len(rest), 1)), rest]), axis=1)
+            counts = self.scorer.complete_patterns(larger) @ self.scorer.counts
+            s = tuple(int(f) for f in larger[np.lexsort((-var[rest], -counts))[0]])
+        self.evaluate([s])
+
+    def upper_bounds(self, sets):
+        """ Bounds the score of every full size set made of one of 'sets' and features after its last one
+
+                Split a set into its first features A and the rest C, the sum of the top eigenvalues of a positive
+                block matrix is at most that of A plus that of C (itself at most the total variance t of C), so
+                its score is at most (top(A) + t) / (total(A) + t) which grows with t up to the largest t left.
+                The bound holds when every set is fitted on the same rows (no missing values in the features),
+                otherwise each set is fitted on its own complete rows and the bound is only an estimate.
+
+            Inputs:
+                (List of Tuples) - 'sets' : Sorted feature positions of sets of the same size
+            Outputs:
+                (numpy.ndarray) - The bound on the score of each set, inf when it can't be computed
+        """
+        idx = np.array(sets, dtype=np.intp)
+        r = self.k - idx.shape[1]
+        cov, n = self.scorer.covariances(idx)
+        bad = (n < 2) | np.isnan(cov).any(axis=(1, 2))
+        eig = np.linalg.eigvalsh(np.nan_to_num(cov))
+        top = eig[:, -self.n_components:].sum(axis=1)
+        total = eig.sum(axis=1)
+        # The largest total variance the remaining features can add
+        rest = self.largest_variances(r)[idx[:, -1] + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bound = np.minimum(1.0, (top + rest) / (total + rest)) * 100
+        return np.where(bad | ~np.isfinite(bound), np.inf, bound)
+
+    def largest_variances(self, r):
+        """ Returns the sum of the 'r' largest variances of the features from each position on
+        """
+        if r not in self.variance_sums:
+            d = len(self.scorer.features)
+            var, _ = self.scorer.covariances(np.arange(d)[:, None])
+            var = np.nan_to_num(var.ravel(), nan=np.inf)
+            self.variance_sums[r] = np.array(
+                [np.sort(var[s:])[::-1][:r].sum() for s in range(d + 1)])
+        return self.variance_sums[r]
+
+    def branch_and_bound(self):
+        """ Walks the sets in the order of 'itertools.combinations' skipping every branch whose upper bound is below the best score
+                the best set of a greedy forward search is scored first so branches are pruned from the start
+        """
+        d = len(self.scorer.features)
+        if self.k <= self.n_components:
+            return self.stream()
+        greedy = FeatureSearch(self.scorer, self.k,
+                               self.n_components, self.min_rows, self.budget)
+        greedy.forward()
+        incumbent = greedy.best[1] if greedy.best is not None else -np.inf
+
+        def visit(chosen, start):
+            if self.budget.exhausted():
+                return
+            if len(chosen) == self.k - 1:
+                self.exhaustive(chosen + (f,) for f in range(start, d))
+                return
+            children = [chosen + (f,) for f in range(start, d - (self.k - len(chosen)) + 1)]
+            # A set no larger than the number of axes is fully explained so there is nothing to bound yet
+            bounds = np.full(len(children), np.inf)
+            if children and len(children[0]) > self.n_components:
+                bounds = self.upper_bounds(children)
+            for child, bound in zip(children, bounds):
+                best = max(incumbent, self.best[1] if self.best is not None else -np.inf)
+                # A rounded score can only tie the best if its bound is within rounding of it
+                if bound < best - 0.005:
+                    continue
+                visit(child, child[-1] + 1)
+
+        visit((), 0)
+        # The greedy set is only kept if the walk ran out of budget before reaching anything as good
+        if greedy.best is not None and (self.best is None or greedy.best[1] > self.best[1]):
+            self.best = greedy.best
+        if self.n_top > 1 and greedy.best is not None:
+            self.keep_top([greedy.best])
+        if self.partial is None:
+            self.partial = greedy.partial
+
+
+def search_feature_sets(df, num_features, field, n_components, features, strategy='exact', beam_width=8,
+                        max_evals=None, max_time=None, min_rows=1, correlation=False):
+    """ Finds the set of 'num_features' features whose PCA explains the most variance
+
+            'exact' : scores every set, it can't be given a budget
+            'stream' : scores every set in chunks without listing them first, stopping once the budget is used up
+            'forward' / 'backward' : greedy forward selection / backward elimination
+            'beam' : keeps the 'beam_width' best sets while growing them one feature at a time
+            'branch_and_bound' : walks every set but skips branches whose explained variance upper bound is below the best score
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df': The DataFrame of our morphometric measurements
+            (Int) - 'num_features': The number of features in a set
+            (String) - 'field': What is the target variable in the dataset
+            (Int) - 'n_components': The number of PCA axes the sets are scored on
+            (List of Strings) - 'features': The features to choose from
+            (String) - 'strategy': One of SEARCH_STRATEGIES
+            (Int) - 'beam_width': The number of sets the beam search keeps
+            (Int or None) - 'max_evals': The most feature sets to score
+            (Float or None) - 'max_time': The most seconds to search for
+            (Int) - 'min_rows': The fewest complete rows a feature set needs to be scored
+            (Boolean) - 'correlation': Score the PCA of the standardized features
+        Outputs:
+            (Tuple) - 'best_features', 'score' : the best feature set found and its score,
+                      once the budget runs out before a full size set is scored the largest set scored is completed
+                      by the features keeping the most rows (see 'FeatureSearch.finish')
+    """
+    features = list(features)
+    search = run_search(df, num_features, field, n_components, features, strategy, beam_width,
+                        max_evals, max_time, min_rows, correlation)
+    positions, score = search.best
+    return [features[i] for i in positions], score
+
+
+def run_search(df, num_features, field, n_components, features, strategy='exact', beam_width=8,
+               max_evals=None, max_time=None, min_rows=1, correlation=False, n_top=1):
+    """ Runs a FeatureSearch (see 'search_feature_sets' for the inputs)
+
+        Outputs:
+            (FeatureSearch Object Class) - The finished search, with the 'n_top' best sets in 'search.top' if 'n_top' > 1
+    """
+    assert strategy in SEARCH_STRATEGIES, f"Unknown search strategy : {strategy}"
+    assert strategy != 'exact' or (max_evals is None and max_time is None), \
+        "The 'exact' search scores every feature set, use 'stream' to search within a budget"
+    scorer = SubsetScorer(df, features, field, correlation)
+    budget = SearchBudget(max_evals, max_time)
+    search = FeatureSearch(scorer, num_features, n_components, min_rows, budget, n_top)
+    if strategy == 'beam':
+        search.beam(beam_width)
+    else:
+        getattr(search, strategy)()
+
+    if budget.exhausted():
+        warnings.warn(f"Feature search '{strategy}' stopped early after scoring {budget.evals} feature sets",
+                      stacklevel=2)
+        search.finish()
+        if search.best is None:
+            raise ValueError(
+                'The search budget ran out before a feature set with enough complete rows was found')
+    if search.best is None:
+        raise ValueError('No feature set has enough complete rows to be scored')
+    return search
+
+
+def bootstrap_feature_sets(df, num_features, field, n_components, features, n_boot=1000, alpha=0.05, seed=0,
+                           n_candidates=BOOTSTRAP_CANDIDATES, **search):
+    """ How stable the choice of the best feature set is: the best sets of a search are scored again on 'n_boot'
+        resamples of the rows, each resample selects its best set and gives every set a score
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df': The DataFrame of our morphometric measurements
+            (Int) - 'num_features': The number of features in a set
+            (String) - 'field': What is the target variable in the dataset
+            (Int) - 'n_components': The number of PCA axes the sets are scored on
+            (List of Strings) - 'features': The features to choose from
+            (Int) - 'n_boot': The number of resamples
+            (Float) - 'alpha': The confidence intervals cover 1 - 'alpha' of the resampled scores
+            (Int) - 'seed': Seed of the resamples
+            (Int) - 'n_candidates': The number of best sets of the search that are resampled
+            (Keyword Arguments) - 'search': The other arguments of 'search_feature_sets' i.e strategy='beam'
+        Outputs:
+            (List of Dictionaries) - for each candidate, best first: {'features': the set, 'score': its score on every row,
+                                     'frequency': the share of resamples selecting it, 'low', 'high': its confidence interval}
+    """
+    features = list(features)
+    result = run_search(df, num_features, field, n_components, features, n_top=n_candidates, **search)
+    top = result.top or [result.best]
+    idx = np.array([positions for positions, _ in top], dtype=np.intp)
+    scores, counts = result.scorer.bootstrap(idx, n_components, n_boot, seed)
+
+    valid = (counts >= result.min_rows) & ~np.isnan(scores)
+    value = np.where(valid, scores, -np.inf)
+    # Each resample selects its first best set like the search does, resamples where no set can be scored select none
+    selected = np.argmax(value, axis=1)[np.isfinite(value.max(axis=1))]
+    frequency = np.bincount(selected, minlength=len(idx)) / n_boot
+    with warnings.catch_warnings():
+        # Sets never scored on a resample have no interval
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low, high = np.nanpercentile(np.where(valid, scores, np.nan),
+                                     [50 * alpha, 100 - 50 * alpha], axis=0)
+    return [{'features': [features[i] for i in positions], 'score': score, 'frequency': f, 'low': lo, 'high': hi}
+            for (positions, score), f, lo, hi in zip(top, frequency, low, high)]
@@ -12,9 +12,9 @@
 import os
 import pyfiglet
 import color
+import render
 import viz_data
-from scale_data import WT_DATA, SAMPLES_DATA, MUTANT_DATA
-from copy import deepcopy
+from scale_data import DATASETS
 
 
 def generate_data(color_classification, colors=None, mutants=False):
@@ -23,51 +23,58 @@ def generate_data(color_classification, colors=None, mutants=False):
         Inputs:
             (String) - 'color_classification' : The Type of color classification to apply to our data 
 
-                VALID INPUTS:  ['rgb','validated','closest']
+                VALID INPUTS:  ['rgb','validated','closest','all']
                 ______________
                 - 'rgb': scale color is labeled to the closest definable color in CSS3 given the color's RGB values
                 - 'closest': scale color is labeled to the closest definable color in CSS3 given the color's RGB values from within 'colors' or a default bin of common colors
                 - 'validate': data generated is only in cases where the scale color description given in the publication is confirmed by our color classification
                             NOTE : 'validated' does not work on mutant analysis
+                - 'all': every labeling above at once as extra columns i.e 'scale_color_rgb', 'scale_color_closest', 'validated' (see color.gen_all_classifications)
             (List of Strings or None) - 'colors' : A list of colors to bin scale_color definitions by. if None then DEFAULT_COLORS in color.py is used
+                                                   for 'all' this can also be a list of lists or a dictionary of named lists of colors
             (Boolean) - 'mutants' : generate data for mutant analysis
 
         Outputs:
             (Tuple of Pandas.DataFrame Type Object Classes) - either samples_data,wt_data for mutants == False or wt_data, mutant_data for mutants  == True
     """
-    # Make a copy of the dataframes so they aren't overwritten
-    WT, SAMPLES, MUTANTS = deepcopy(WT_DATA), deepcopy(
-        SAMPLES_DATA), deepcopy(MUTANT_DATA)
+    # Only the tables we need are loaded, every stage below reads the shared tables and returns new ones
+    DATASETS.prefetch(['samples_info', 'wt_table', 'mutant_table']
+                      if mutants else ['samples_info', 'wt_table'])
+    if color_classification == 'all':
+        # Every labeling is written as an extra column from a single pass over the samples
+        if not mutants:
+            return color.gen_all_classifications(
+                DATASETS['samples_info'], [(DATASETS['wt_table'], False)], colors)
+        _, wt_data, mutant_data = color.gen_all_classifications(
+            DATASETS['samples_info'], [(DATASETS['wt_table'], False), (DATASETS['mutant_table'], True)], colors)
+        return wt_data, mutant_data
 
     if not mutants:
-        if color_classification is 'rgb':
-            samples, data = color.gen_rgb_data(SAMPLES_DATA, WT_DATA)
-        if color_classification is 'validated':
-            samples, data = color.gen_validated_by_data(SAMPLES_DATA, WT_DATA)
-
-        if color_classification is 'closest':
+        if color_classification == 'rgb':
+            samples, data = color.gen_rgb_data(
+                DATASETS['samples_info'], DATASETS['wt_table'])
+        if color_classification == 'validated':
+            samples, data = color.gen_validated_by_data(
+                DATASETS['samples_info'], DATASETS['wt_table'])
+
+        if color_classification == 'closest':
             if type(colors) != list:
-                samples, data = color.gen_custom_closest(SAMPLES_DATA, WT_DATA)
+                samples, data = color.gen_custom_closest(
+                    DATASETS['samples_info'], DATASETS['wt_table'])
             else:
                 samples, data = color.gen_custom_closest(
-                    SAMPLES_DATA, WT_DATA, colors)
+                    DATASETS['samples_info'], DATASETS['wt_table'], colors)
         return samples, data
     else:
-        if color_classification is 'rgb':
-            _, mutant_data = color.gen_rgb_data(SAMPLES, MUTANTS, mutants=True)
-            _, wt_data = color.gen_rgb_data(SAMPLES_DATA, WT)
-
-        if color_classification is 'closest':
-            if type(colors) != list:
-                _, mutant_data = color.gen_custom_closest(
-                    SAMPLES, MUTANTS, mutants=True)
-                _, wt_data = color.gen_custom_closest(SAMPLES_DATA, WT)
-
-            else:
-                _, mutant_data = color.gen_custom_closest(
-                    SAMPLES, MUTANTS, colors=colors, mutants=True)
-                _, wt_data = color.gen_custom_closest(
-                    SAMPLES_DATA, WT, colors)
+        if color_classification == 'rgb':
+            bins = None
+        if color_classification == 'closest':
+            bins = colors if type(colors) == list else color.DEFAULT_COLORS
+        # The samples are classified once and relabel both the mutant and the wild type data
+        samples = color.classify_samples(DATASETS['samples_info'], {'': bins})
+        mutant_data = color.label_data(
+            samples, DATASETS['mutant_table'], [''], mutants=True)
+        wt_data = color.label_data(samples, DATASETS['wt_table'], [''])
         return wt_data, mutant_data
 
 
@@ -85,7 +92,8 @@ def save_data(data, file_name):
     return
 
 
-def main(color_classification='closest', mutant_analysis=False, colors=None, N=3):
+def main(color_classification='closest', mutant_analysis=False, colors=None, N=3, max_workers=viz_data.DEFAULT_WORKERS,
+         render_mode=None, figure_dir=None, figure_format=None):
     """ ~ Main Function For our Program: 
             Generates the data for scale analysis given our color classification methods. 
             Applies our feature selection method using a PCA on either a family by family basis 
@@ -97,21 +105,27 @@ def main(color_classification='closest', mutant_analysis=False, colors=None, N=3
             (Boolean) - 'mutant_analysis' : determines the analysis conducted -- True for mutant, false for family 
             (List of strings or None) - 'colors':  A list of colors to bin scale_color definitions by. if None then DEFAULT_COLORS in color.py is used
             (Int) - 'N' : The number of ultra-scale charecteritics to select from the default range of all charecteristics
+            (Int or None) - 'max_workers' : The number of families or mutants analyzed at once, None for one per core and 1 for one after the other
+            (String or None) - 'render_mode' : Where figures go, one of render.RENDER_MODES, if None then render.DEFAULT_RENDER_MODE
+                                               'static' writes them to 'figure_dir' as 'figure_format' ('png', 'svg' or 'html') to run without a display
 
         Outputs:
             (None)
     """
+    render.configure(render_mode, figure_dir, figure_format)
     if not mutant_analysis:
         _, data = generate_data(color_classification, colors, False)
         # Case of family analysis
-        viz_data.wt_analysis(data, N)
+        viz_data.wt_analysis(data, N, max_workers)
         save_data(data, 'fam_data_'+color_classification+'.csv')
     else:
         # Case of Mutants
         data = generate_data(color_classification, colors, True)
         wt_data, mutant_data = data
-        viz_data.mutant_analysis(wt_data, mutant_data, N)
+        viz_data.mutant_analysis(wt_data, mutant_data, N, max_workers)
         save_data(mutant_data, 'mutant_data_'+color_classification+'.csv')
+    # Every static figure is written before we are done
+    render.wait()
 
 
 if __name__ == "__main__":
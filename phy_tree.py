@@ -13,6 +13,7 @@ Class to Visualize the Phylogenetic Relationships/Connections in the Data
 
 import networkx as nx
 import matplotlib.pyplot as plt
+import render
 
 # I am using a networkx.Graph Type object to represent my Phylogentic Tree
 DEFAULT_GRAPH = nx.Graph()
@@ -104,8 +105,10 @@ def draw_tree(Tree):
     # Draw the Kamada Kawaii
     nx.draw_kamada_kawai(Tree, with_labels=1)
     plt.axis('off')
-    plt.show()
-    plt.clf()
+    fig = plt.gcf()
+    render.show(fig, 'phylogenetic tree')
+    # The tree must not be drawn over by the next plot
+    plt.close(fig)
     return
 
 
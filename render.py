@@ -0,0 +1,190 @@
+""" render.py
+
+Where the Figures of our Visualizations go: shown interactively, written to files, or nowhere
+
+    SCALE PROJECT -- KRONFORST LABORATORY AT THE UNIVERSITY OF CHICAGO
+                  -- ALL RIGHTS RESERVED
+
+"""
+import os
+import re
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from matplotlib.figure import Figure
+import matplotlib.pyplot as plt
+
+# 'interactive' : show every figure (a browser tab or window), 'static' : write every figure to a file, 'off' : drop them
+RENDER_MODES = ['interactive', 'static', 'off']
+# The file formats of static figures, matplotlib figures asked for as 'html' are written as 'png'
+STATIC_FORMATS = ['png', 'svg', 'html']
+# Plotly figures are only written as 'png' or 'svg' with the 'kaleido' package installed
+PLOTLY_IMAGE_PACKAGE = 'kaleido'
+DEFAULT_RENDER_MODE = os.environ.get('SCALE_RENDER', 'interactive')
+DEFAULT_FIGURE_DIR = os.environ.get('SCALE_FIGURE_DIR', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'figures'))
+DEFAULT_FIGURE_FORMAT = os.environ.get('SCALE_FIGURE_FORMAT', 'png')
+# The number of figures encoded and written at the same time
+DEFAULT_EXPORT_WORKERS = 4
+
+
+def slugify(text):
+    """ Makes a title safe to use in a file name i.e '2-Component PCA : nymphalidae' >> '2-component-pca-nymphalidae'
+    """
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-')[:80] or 'figure'
+
+
+class FigureRenderer:
+    """
+        Sends every figure to where the current render mode says. In 'static' mode plotly figures are written
+        to 'self.directory' by a pool of threads so encoding the images overlaps with the analysis, matplotlib
+        figures are written right away by the calling thread as pyplot is not thread-safe.
+        Files are numbered in the order the figures were made.
+
+        attr :: self.mode - One of RENDER_MODES
+        attr :: self.directory - Where static figures are written
+        attr :: self.fmt - One of STATIC_FORMATS
+        attr :: self.max_workers - The number of figures written at the same time
+        attr :: self.count - The number of figures rendered so far
+        attr :: self.pending - The plotly exports not yet waited on
+    """
+
+    def __init__(self, mode=DEFAULT_RENDER_MODE, directory=DEFAULT_FIGURE_DIR, fmt=DEFAULT_FIGURE_FORMAT,
+                 max_workers=DEFAULT_EXPORT_WORKERS):
+        """ FigureRenderer Constructor
+
+            param :: 'mode' - String, one of RENDER_MODES
+            param :: 'directory' - String, where static figures are written
+            param :: 'fmt' - String, one of STATIC_FORMATS
+            param :: 'max_workers' - Int, the number of figures written at the same time
+        """
+        self.pool = None
+        self.pending = []
+        self.count = 0
+        self._lock = threading.Lock()
+        self.configure(mode, directory, fmt, max_workers)
+
+    def configure(self, mode=None, directory=None, fmt=None, max_workers=None):
+        """ Changes where figures go, anything left as None stays as it is
+                the figures already sent to be written are waited on first, a static mode missing what it needs
+                to write figures fails here rather than once the figures are waited on
+        """
+        self.wait()
+        self.mode = mode or getattr(self, 'mode', DEFAULT_RENDER_MODE)
+        self.directory = directory or getattr(self, 'directory', DEFAULT_FIGURE_DIR)
+        self.fmt = fmt or getattr(self, 'fmt', DEFAULT_FIGURE_FORMAT)
+        self.max_workers = max_workers or getattr(self, 'max_workers', DEFAULT_EXPORT_WORKERS)
+        assert self.mode in RENDER_MODES, f"Unknown render mode : {self.mode}"
+        assert self.fmt in STATIC_FORMATS, f"Unknown figure format : {self.fmt}"
+        if self.mode == 'static':
+            if self.fmt != 'html' and importlib.util.find_spec(PLOTLY_IMAGE_PACKAGE) is None:
+                raise ImportError(f"Writing plotly figures as '{self.fmt}' needs the '{PLOTLY_IMAGE_PACKAGE}' package, "
+                                  "install it or use the 'html' format")
+            os.makedirs(self.directory, exist_ok=True)
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        # Without a display matplotlib must not try to open windows
+        if self.mode != 'interactive':
+            plt.switch_backend('agg')
+
+    def show(self, fig, name):
+        """ Renders a figure
+
+            Inputs:
+                ('plotly.graph_objects.Figure' or 'matplotlib.figure.Figure' Object Class) - 'fig' : The figure
+                (String) - 'name' : What the figure shows, used to name its file
+            Outputs:
+                (String or None) - The file the figure is written to in 'static' mode
+        """
+        is_mpl = isinstance(fig, Figure)
+        if self.mode == 'interactive':
+            if is_mpl:
+                plt.show()
+            else:
+                fig.show()
+            return None
+        if self.mode == 'off':
+            if is_mpl:
+                plt.close(fig)
+            return None
+
+        with self._lock:
+            self.count += 1
+            number = self.count
+        fmt = 'png' if is_mpl and self.fmt == 'html' else self.fmt
+        path = os.path.join(self.directory, f"{number:04d}_{slugify(name)}.{fmt}")
+        if is_mpl:
+            export_figure(fig, path, fmt)
+            # The figure leaves pyplot so the next plot starts on a new one
+            plt.close(fig)
+            return path
+        self.raise_failed()
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.pending.append(self.pool.submit(export_figure, fig, path, fmt))
+        return path
+
+    def raise_failed(self):
+        """ Raises the error of the first export that has already failed, so a failure stops the run at the next figure
+        """
+        for future in self.pending:
+            if future.done() and future.exception() is not None:
+                self.wait()
+
+    def wait(self):
+        """ Waits for every figure sent to be written, raising the first error of any of them
+        """
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
+
+
+def export_figure(fig, path, fmt):
+    """ Writes a figure to a file
+
+        Inputs:
+            ('plotly.graph_objects.Figure' or 'matplotlib.figure.Figure' Object Class) - 'fig' : The figure
+            (String) - 'path' : The file to write
+            (String) - 'fmt' : One of STATIC_FORMATS
+        Outputs:
+            (None)
+    """
+    if isinstance(fig, Figure):
+        fig.savefig(path, format=fmt, bbox_inches='tight')
+    elif fmt == 'html':
+        fig.write_html(path, include_plotlyjs='cdn')
+    else:
+        # Static images of plotly figures need the 'kaleido' package
+        fig.write_image(path, format=fmt)
+    return
+
+
+# Every figure of our program goes through this renderer
+RENDERER = FigureRenderer()
+
+
+def configure(mode=None, directory=None, fmt=None, max_workers=None):
+    """ Changes where every figure goes (see 'FigureRenderer.configure')
+
+        Inputs:
+            (String or None) - 'mode' : One of RENDER_MODES
+            (String or None) - 'directory' : Where static figures are written
+            (String or None) - 'fmt' : One of STATIC_FORMATS
+            (Int or None) - 'max_workers' : The number of figures written at the same time
+        Outputs:
+            (None)
+    """
+    RENDERER.configure(mode, directory, fmt, max_workers)
+
+
+def show(fig, name):
+    """ Renders a figure with the shared renderer (see 'FigureRenderer.show')
+    """
+    return RENDERER.show(fig, name)
+
+
+def wait():
+    """ Waits for every static figure to be written
+    """
+    RENDERER.wait()
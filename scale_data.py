@@ -9,7 +9,19 @@ GoogleSheets Database is pre-processed for analysis
         Lukas Elsrode - Undergraduate Researcher at the Kronforst Laboratory wrote and tested this code 
         (10/21/2021)
 """
+import os
+import io
+import json
+import time
+import hashlib
+import weakref
+import threading
+import warnings
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 # We use Pandas.DataFrame Object Classes to hold our data
+import numpy as np
 import pandas as pd
 
 
@@ -25,19 +37,115 @@ sheet_input_range = {
     'samples_info': DEFAULT_SAMPLES_RANGE
 }
 
+# The Hierarchy and Color columns repeat a handful of values over every scale, we store them as categories
+CATEGORICAL_COLUMNS = [
+    'family',
+    'subfamily',
+    'tribe',
+    'genus',
+    'species',
+    'genotype',
+    'scale_color',
+    'scale_color_post',
+    'labeled_color',
+    'irr_color'
+]
+
+# The columns of every cleaned sheet our custom index is built from: species, genotype and its two color columns.
+# In the raw sheets the two color columns follow the genotype, 'clean_df' gives them these names
+SHEET_INDEX_COLUMNS = {
+    'wt_table': ('species', 'genotype', 'scale_color', 'irr_color'),
+    'mutant_table': ('species', 'genotype', 'scale_color', 'scale_color_post'),
+    'samples_info': ('species', 'genotype', 'labeled_color', 'irr_color')
+}
+
+
+# Where our GoogleSheets Database lives, '{sheet_name}' is filled in for every sheet
+SHEET_ID = '10YVwgtR8W4JqSWyDhCpJFUdw1BIJZXSx89oly8HHhwI'
+SHEET_URL = "https://docs.google.com/spreadsheets/d/" + \
+    SHEET_ID + "/gviz/tq?tqx=out:csv&sheet={sheet_name}"
+
+# The source can be overwritten by a local directory of '<sheet_name>.csv' exports to work without a network
+DEFAULT_SHEET_SOURCE = os.environ.get('SCALE_SHEET_SOURCE', SHEET_URL)
+
+# Local snapshots of the cleaned sheets so we don't download and re-clean them on every run
+DEFAULT_CACHE_DIR = os.environ.get('SCALE_CACHE_DIR', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '.scale_cache'))
+# How long (in seconds) a snapshot is trusted before we check the source for changes
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+# Never touch the source, only read the local snapshots
+DEFAULT_OFFLINE = os.environ.get('SCALE_OFFLINE', '') not in ['', '0']
+# Bump this whenever 'clean_df' changes so older snapshots are not reused
+CLEANING_VERSION = 3
+# Seconds to wait on the sheet endpoint, how many times to try again and the base delay between tries
+DEFAULT_FETCH_TIMEOUT = 30
+DEFAULT_FETCH_RETRIES = 3
+DEFAULT_FETCH_BACKOFF = 0.5
+# Seconds a whole download of one sheet may take, every try and wait between them included
+DEFAULT_FETCH_DEADLINE = 120
+# Bytes read from the endpoint at a time, the deadline is checked between reads
+FETCH_CHUNK_SIZE = 2**16
+
+
+def fetch_sheet(sheet_name='wt_table', source=DEFAULT_SHEET_SOURCE, timeout=DEFAULT_FETCH_TIMEOUT, retries=DEFAULT_FETCH_RETRIES,
+                backoff=DEFAULT_FETCH_BACKOFF, deadline=DEFAULT_FETCH_DEADLINE):
+    """ Returns the raw CSV export of a sheet from our DataBase
 
-# We write a function to get and write into a Pandas.DataFrame from a URL
-def get_df(sheet_name='wt_table'):
-    """Returns DataFrame of Relevant DataSheet Associated with our DataBase 
         Inputs:
-            (string)- sheet_name : Name of the sheet i.e 'wt_table','mutant_table','samples_info'
+            (string) - 'sheet_name' : Name of the sheet i.e 'wt_table','mutant_table','samples_info'
+            (string) - 'source' : URL template containing '{sheet_name}' or a local directory holding '<sheet_name>.csv' files
+            (Float) - 'timeout' : Seconds to wait on any one read from the endpoint before giving up on a try
+            (Int) - 'retries' : How many more times to try after a failed download
+            (Float) - 'backoff' : Seconds to wait before the first retry, doubled after every failure
+            (Float or None) - 'deadline' : Seconds the whole download may take, if None then only 'timeout' bounds it
         Outputs:
-            ('Pandas.DataFrame' Class Object) - df_raw : Raw Data of our study formated
+            (bytes) - The CSV content of the sheet
+    """
+    # Local stand-in for the sheet endpoint
+    if os.path.isdir(source):
+        with open(os.path.join(source, sheet_name + '.csv'), 'rb') as f:
+            return f.read()
+    url = source.format(sheet_name=sheet_name)
+    # 'timeout' only bounds each socket operation, a slow endpoint could trickle the sheet in forever without a deadline
+    end = None if deadline is None else time.monotonic() + deadline
+
+    def remaining():
+        if end is None:
+            return timeout
+        left = end - time.monotonic()
+        if left <= 0:
+            raise TimeoutError(f"Fetching '{sheet_name}' took longer than {deadline} seconds")
+        return min(timeout, left)
+
+    for attempt in range(retries + 1):
+        try:
+            with urllib.request.urlopen(url, timeout=remaining()) as response:
+                chunks = []
+                while True:
+                    remaining()
+                    chunk = response.read1(FETCH_CHUNK_SIZE)
+                    if not chunk:
+                        return b''.join(chunks)
+                    chunks.append(chunk)
+        except OSError as e:
+            # Requests the endpoint refuses outright won't succeed by asking again
+            if isinstance(e, urllib.error.HTTPError) and e.code < 500 and e.code != 429:
+                raise
+            if attempt == retries:
+                raise
+        # Once the deadline has passed there is no time left for another try
+        time.sleep(min(backoff * 2 ** attempt, remaining()))
+
+
+def clean_df(df, sheet_name='wt_table'):
+    """ Formats the raw data of one of our sheets
+
+        Inputs:
+            ('Pandas.DataFrame' Class Object) - 'df' : The sheet as it was read from the CSV export
+            (string) - 'sheet_name' : Name of the sheet i.e 'wt_table','mutant_table','samples_info'
+        Outputs:
+            ('Pandas.DataFrame' Class Object) - 'df' : Raw Data of our study formated
     """
-    # All data #
-    sheet_id = '10YVwgtR8W4JqSWyDhCpJFUdw1BIJZXSx89oly8HHhwI'
-    url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name}"
-    df = pd.read_csv(url)
     rv = []
     # manual cleaning of columns
     for c in df.columns:
@@ -45,7 +153,7 @@ def get_df(sheet_name='wt_table'):
             pass
         else:
             rv.append(c)
-    df = df[rv]
+    df = name_index_columns(df[rv], sheet_name)
 
     # get the numeric range of measurement entries
     q1, q2 = sheet_input_range[sheet_name]
@@ -59,19 +167,367 @@ def get_df(sheet_name='wt_table'):
 
     for qual_var in qual_vars:
         # Format some strings to be uniform
-        df[qual_var] = [str(i).lower().replace(" ", "")
-                        for i in df[qual_var].values]
+        codes, categories = normalize_strings(df[qual_var])
+        if qual_var in CATEGORICAL_COLUMNS:
+            df[qual_var] = pd.Categorical.from_codes(codes, categories)
+        else:
+            df[qual_var] = categories.take(codes)
 
     return df
 
 
+def name_index_columns(df, sheet_name='wt_table'):
+    """ Gives the two color columns following the genotype of a sheet their names in SHEET_INDEX_COLUMNS
+
+        Inputs:
+            ('Pandas.DataFrame' Class Object) - 'df' : The sheet as it was read from the CSV export
+            (string) - 'sheet_name' : Name of the sheet i.e 'wt_table','mutant_table','samples_info'
+        Outputs:
+            ('Pandas.DataFrame' Class Object) - 'df' : The sheet with its color columns named
+    """
+    species, genotype, first, second = SHEET_INDEX_COLUMNS[sheet_name]
+    for c in (species, genotype):
+        if c not in df.columns:
+            raise KeyError(f"The {sheet_name} sheet has no column '{c}'")
+    g = df.columns.get_loc(genotype)
+    if g + 2 >= len(df.columns):
+        raise KeyError(f"The {sheet_name} sheet has no two color columns after '{genotype}'")
+    names = {df.columns[g + 1]: first, df.columns[g + 2]: second}
+    for old, new in names.items():
+        if old != new and new in df.columns:
+            raise ValueError(f"The {sheet_name} sheet already has a column '{new}' besides its color column '{old}'")
+    return df.rename(columns=names)
+
+
+def normalize_strings(column):
+    """ Lower cases and strips the spaces out of every entry of a column
+            Only the distinct entries are formated, so the work is done once per value and not once per row
+
+        Inputs:
+            ('Pandas.Series' Class Object) - 'column' : A qualitative column of one of our sheets
+        Outputs:
+            (Tuple) - 'codes', 'categories' : The position of every entry in the (numpy.ndarray) of the formated distinct values
+    """
+    codes, uniques = pd.factorize(column.to_numpy())
+    uniques = np.asarray(uniques, dtype=object).astype(str)
+    # Missing entries are written 'nan' just like 'str' does
+    missing = codes == -1
+    if missing.any():
+        uniques = np.append(uniques, 'nan')
+        codes[missing] = len(uniques) - 1
+    formated = pd.Index(uniques).str.lower().str.replace(' ', '', regex=False)
+    # Diffrent raw entries can become the same value once formated i.e 'Black' & 'black'
+    new_codes, categories = pd.factorize(formated.to_numpy())
+    return new_codes[codes], categories
+
+
+def snapshot_key(raw, sheet_name='wt_table'):
+    """ Content address of a cleaned sheet: changes whenever the raw data or the way we clean it changes
+
+        Inputs:
+            (bytes) - 'raw' : The CSV content of the sheet
+            (string) - 'sheet_name' : Name of the sheet i.e 'wt_table','mutant_table','samples_info'
+        Outputs:
+            (string) - hex digest naming the snapshot
+    """
+    h = hashlib.sha256(raw)
+    h.update(f"{sheet_name}:{sheet_input_range[sheet_name]}:{CLEANING_VERSION}".encode())
+    return h.hexdigest()
+
+
+def write_snapshot(df, path):
+    """ Saves a cleaned sheet to disk as Parquet, falls back on a pickle if no Parquet engine is installed
+
+        Inputs:
+            ('Pandas.DataFrame' Class Object) - 'df' : The cleaned sheet
+            (string) - 'path' : Where to write the snapshot without its extension
+        Outputs:
+            (string) - The format the snapshot was written in, 'parquet' or 'pickle'
+    """
+    # Write next to the target and move it into place so readers never see half a file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp)
+        fmt = 'parquet'
+    except ImportError:
+        df.to_pickle(tmp)
+        fmt = 'pickle'
+    os.replace(tmp, path + '.' + fmt)
+    return fmt
+
+
+def read_snapshot(path, fmt):
+    """ Reads a cleaned sheet written by 'write_snapshot'
+
+        Inputs:
+            (string) - 'path' : Where the snapshot was written without its extension
+            (string) - 'fmt' : The format the snapshot was written in, 'parquet' or 'pickle'
+        Outputs:
+            ('Pandas.DataFrame' Class Object) - The cleaned sheet
+    """
+    if fmt == 'parquet':
+        return pd.read_parquet(path + '.parquet')
+    return pd.read_pickle(path + '.pickle')
+
+
+def _read_manifest(cache_dir, sheet_name):
+    """ Returns the manifest of the latest snapshot of a sheet or None if we have never cached it
+    """
+    try:
+        with open(os.path.join(cache_dir, sheet_name + '.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(cache_dir, sheet_name, manifest, previous=None):
+    """ Points the sheet at its latest snapshot and removes the snapshot of the 'previous' manifest it replaces
+    """
+    path = os.path.join(cache_dir, sheet_name + '.json')
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+    # Only the latest snapshot of a sheet is ever read again
+    if previous is not None and previous['key'] != manifest['key']:
+        for fmt in ['parquet', 'pickle']:
+            try:
+                os.remove(os.path.join(cache_dir, previous['key'] + '.' + fmt))
+            except OSError:
+                pass
+
+
+# We write a function to get and write into a Pandas.DataFrame from a URL
+def get_df(sheet_name='wt_table', source=None, cache_dir=None, ttl=DEFAULT_CACHE_TTL, refresh=False, offline=None,
+           timeout=DEFAULT_FETCH_TIMEOUT, retries=DEFAULT_FETCH_RETRIES, backoff=DEFAULT_FETCH_BACKOFF,
+           deadline=DEFAULT_FETCH_DEADLINE):
+    """Returns DataFrame of Relevant DataSheet Associated with our DataBase 
+        Cleaned sheets are kept as snapshots in 'cache_dir' and are only downloaded again once they are older than 'ttl'
+
+        Inputs:
+            (string)- sheet_name : Name of the sheet i.e 'wt_table','mutant_table','samples_info'
+            (string or None) - 'source' : URL template or local directory of the sheets, if None then DEFAULT_SHEET_SOURCE is used
+            (string or None) - 'cache_dir' : Directory holding our snapshots, if None then DEFAULT_CACHE_DIR is used
+            (Int) - 'ttl' : Seconds a snapshot is used for without checking the source
+            (Boolean) - 'refresh' : Always check the source for a new version of the sheet
+            (Boolean or None) - 'offline' : Only ever read local snapshots, if None then DEFAULT_OFFLINE is used
+            (Float) - 'timeout', (Int) - 'retries', (Float) - 'backoff', (Float) - 'deadline' : How to download the sheet, see 'fetch_sheet'
+        Outputs:
+            ('Pandas.DataFrame' Class Object) - df_raw : Raw Data of our study formated
+    """
+    source = DEFAULT_SHEET_SOURCE if source is None else source
+    cache_dir = DEFAULT_CACHE_DIR if cache_dir is None else cache_dir
+    offline = DEFAULT_OFFLINE if offline is None else offline
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Warm start: the latest snapshot is still fresh
+    manifest = _read_manifest(cache_dir, sheet_name)
+    if manifest is not None and not refresh:
+        age = time.time() - manifest['fetched']
+        if offline or age < ttl:
+            try:
+                return read_snapshot(os.path.join(cache_dir, manifest['key']), manifest['format'])
+            except (OSError, ImportError):
+                pass
+    if offline:
+        raise FileNotFoundError(
+            f"No local snapshot of '{sheet_name}' in {cache_dir} and offline mode is on")
+
+    # Cold start: get the sheet, but if we can't reach it a stale snapshot is better than nothing
+    try:
+        raw = fetch_sheet(sheet_name, source, timeout, retries, backoff, deadline)
+    except OSError as e:
+        if manifest is None or refresh:
+            raise
+        warnings.warn(f"Could not fetch '{sheet_name}' ({e}), using the snapshot from {time.ctime(manifest['fetched'])}",
+                      stacklevel=2)
+        return read_snapshot(os.path.join(cache_dir, manifest['key']), manifest['format'])
+
+    # The same content has already been cleaned once
+    key = snapshot_key(raw, sheet_name)
+    path = os.path.join(cache_dir, key)
+    df = None
+    for fmt in ['parquet', 'pickle']:
+        if os.path.exists(path + '.' + fmt):
+            try:
+                df = read_snapshot(path, fmt)
+                break
+            except (OSError, ImportError):
+                continue
+    if df is None:
+        df = clean_df(pd.read_csv(io.BytesIO(raw)), sheet_name)
+        fmt = write_snapshot(df, path)
+
+    _write_manifest(cache_dir, sheet_name, {
+                    'key': key, 'format': fmt, 'fetched': time.time()}, manifest)
+    return df
+
+
+def get_dfs(sheet_names=('wt_table', 'samples_info', 'mutant_table'), max_workers=None, **kwargs):
+    """ Returns the DataFrames of several sheets at once, every sheet is downloaded and cleaned concurrently
+        so a cold start takes as long as the slowest sheet rather than all of them back to back
+
+        Inputs:
+            (Tuple of Strings) - 'sheet_names' : The sheets to get i.e ('wt_table','samples_info','mutant_table')
+            (Int or None) - 'max_workers' : The number of sheets to work on at the same time, if None then all of them
+            (Keyword Arguments) - 'kwargs' : Passed on to 'get_df' i.e 'timeout', 'retries', 'deadline', 'refresh'
+        Outputs:
+            (Tuple of 'Pandas.DataFrame' Class Objects) - The DataFrames in the order of 'sheet_names'
+    """
+    with ThreadPoolExecutor(max_workers=max_workers or len(sheet_names)) as pool:
+        futures = [pool.submit(get_df, name, **kwargs) for name in sheet_names]
+        return tuple(f.result() for f in futures)
+
+
+# What each single letter segments our data by
+SEGMENT_FIELDS = {
+    'f': 'family',
+    's': 'species',
+    'c': 'scale_color',
+    'g': 'genotype',
+    'sf': 'subfamily',
+    't': 'tribe',
+    'ge': 'genus'
+}
+
+
+class GroupIndex:
+    """
+        Row positions of every value of the Hierarchy and Color fields of one DataFrame. 
+        A field (or nested set of fields) is grouped in a single pass over the rows the first time it is 
+        asked for and is grouped again whenever the contents of its columns change.
+
+        attr :: self.n_rows - The number of rows in the indexed DataFrame
+        attr :: self.positions - Dictionary of {(fields) : (fingerprint of the fields, {value(s) : numpy.ndarray of row positions})}
+    """
+
+    def __init__(self, df):
+        """ GroupIndex Constructor
+
+            param :: 'df' - Pandas.DataFrame Type Object Class of our Scale Data 
+        """
+        self.n_rows = len(df)
+        self.positions = {}
+
+    def get(self, df, fields):
+        """ Returns the row positions of every value of 'fields' in 'df'
+
+            Inputs:
+                ('Pandas.DataFrame' Object Class) - 'df' : The indexed DataFrame
+                (Tuple of Strings) - 'fields' : The columns to group by i.e ('family',) or ('family','subfamily')
+            Outputs:
+                (Dictionary) - {value or tuple of values : numpy.ndarray of row positions}
+        """
+        fields = tuple(fields)
+        # Hashing the grouped columns is cheaper than grouping them and catches writes made in place
+        fingerprint = dataset_fingerprint(df, fields)
+        entry = self.positions.get(fields)
+        if entry is None or entry[0] != fingerprint:
+            by = list(fields) if len(fields) > 1 else fields[0]
+            entry = fingerprint, df.groupby(by, sort=False, observed=True).indices
+            self.positions[fields] = entry
+        return entry[1]
+
+
+# The GroupIndex of every DataFrame we have segmented that still exists
+_GROUP_INDEXES = {}
+
+
+def get_group_index(df):
+    """ Returns the GroupIndex of a DataFrame, building it the first time
+            The groups of a field are checked against the contents of its columns every time they are asked for
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
+        Outputs:
+            (GroupIndex Object Class) - The row positions of every group in 'df'
+    """
+    key = id(df)
+    entry = _GROUP_INDEXES.get(key)
+    if entry is None or entry[0]() is not df or entry[1].n_rows != len(df):
+        # Forget the index once the DataFrame is garbage collected
+        ref = weakref.ref(df, lambda _, key=key: _GROUP_INDEXES.pop(key, None))
+        entry = ref, GroupIndex(df)
+        _GROUP_INDEXES[key] = entry
+    return entry[1]
+
+
+def dataset_fingerprint(df, columns=None):
+    """ Content address of a DataFrame: the same rows, columns and values always give the same fingerprint
+            It is hashed again on every call so writing to 'df' in place gives it a new fingerprint
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
+            (list or None) - 'columns' : Only hash these columns of 'df', all of them when None
+        Outputs:
+            (string) - hex digest of the content of 'df'
+    """
+    if columns is not None:
+        df = df[list(columns)]
+    h = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def take_rows(df, positions):
+    """ Returns the rows of 'df' at 'positions', as a view on 'df' when the rows are next to each other
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The DataFrame
+            (numpy.ndarray) - 'positions' : The sorted row positions to take
+        Outputs:
+            ('Pandas.DataFrame' Object Class) - The rows of the DataFrame
+    """
+    if len(positions) and positions[-1] - positions[0] + 1 == len(positions):
+        return df.iloc[positions[0]:positions[-1] + 1]
+    return df.iloc[positions]
+
+
+def stratified_sample(df, field, n_rows, seed=0):
+    """ Draws about 'n_rows' rows of 'df' keeping the share of every value of 'field' i.e of every scale color
+            every value keeps at least one row, rows keep their order
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
+            (string) - 'field' : The column whose values keep their share of rows i.e 'scale_color'
+            (Int) - 'n_rows' : The number of rows to draw
+            (Int) - 'seed' : Seed of the draw so the same rows are drawn every time
+        Outputs:
+            ('Pandas.DataFrame' Object Class) - The drawn rows, 'df' itself if it has no more than 'n_rows' rows
+    """
+    if len(df) <= n_rows:
+        return df
+    rng = np.random.default_rng(seed)
+    groups = get_group_index(df).get(df, (field,))
+    positions = [rng.choice(rows, max(1, round(n_rows * len(rows) / len(df))), replace=False)
+                 for rows in groups.values()]
+    return take_rows(df, np.sort(np.concatenate(positions)))
+
+
+def iter_segments(df, group_by='f'):
+    """ Lazily segments a DataFrame, each segment is only taken out of 'df' once it is reached
+
+            Inputs: 
+                ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
+                (string or List of Strings) - 'group_by' : letter of the field to segment by (see 'segment_df_by_field') 
+                                                            or a list of them to segment at several levels i.e ['f','sf','ge']
+            Outputs:
+                (Generator of Tuples) - 'value', 'segment' : the value(s) of the group and the DataFrame of its entries
+    """
+    levels = [group_by] if type(group_by) == str else list(group_by)
+    fields = tuple(SEGMENT_FIELDS[i] for i in levels)
+    groups = get_group_index(df).get(df, fields)
+    for value, positions in groups.items():
+        yield value, drop_unused_categories(take_rows(df, positions))
+
+
 # Something to split up the Phylogenetic portion of the data
 def segment_df_by_field(df, group_by='f'):
     """ Segments Pandas.DataFrame of Data by Group of total entries within the set of Group_By
         i.e 'scale_color'
 
             Inputs: 
-                (string) - group_by: Single letter to represent what to segment the dataset by
+                (string or List of Strings) - group_by: Single letter to represent what to segment the dataset by
                     ________________
                     'f': by family -- DEFAULT VALUE
                     's': by species
@@ -80,37 +536,144 @@ def segment_df_by_field(df, group_by='f'):
                     't': by tribe
                     'ge': by genus
                     'c': by scale color
+                    or a list of letters to segment nested levels i.e ['f','sf'] by subfamily within each family
 
             Outputs:
                 (list of 'Pandas.DataFrame' Object Classes) - l : A list of datasets 
                     segmented by all values in the group_by set.
     """
-    # initilize list to return
-    l = []
+    return [segment for _, segment in iter_segments(df, group_by)]
+
+
+class DataRegistry:
+    """
+        Lazy Registry of the Sheets in our DataBase. 
+        A sheet is only fetched, parsed and cleaned the first time it is asked for,
+        after which every caller shares the same read-only table, 'copy' gives a table that can be written into.
+
+        attr :: self.loader - Function returning the cleaned 'Pandas.DataFrame' of a sheet given its name i.e 'get_df'
+        attr :: self.tables - Dictionary of the sheets that have been loaded so far
+    """
 
-    # set of all_possible results
-    all_species, all_families, all_colors, all_genotypes, all_subfams, all_tribes, all_genuses = set(df.species), set(
-        df.family), set(df.scale_color), set(df.genotype), set(df.subfamily), set(df.tribe), set(df.genus)
+    def __init__(self, loader=get_df):
+        """ DataRegistry Constructor
 
-    # initilize relavant dictionary
-    d = {'f': ('family', all_families),
-         's': ('species', all_species),
-         'c': ('scale_color', all_colors),
-         'g': ('genotype', all_genotypes),
-         'sf': ('subfamily', all_subfams),
-         't': ('tribe', all_tribes),
-         'ge': ('genus', all_genuses)}
+            param :: 'loader' - Function taking a sheet name and returning its cleaned DataFrame
+        """
+        self.loader = loader
+        self.tables = {}
+        # One lock per sheet so different sheets can load at the same time
+        self._locks = {name: threading.Lock() for name in sheet_input_range}
 
-    # set the variables needed
-    # breaking up the data-frame
+    def load(self, sheet_name):
+        """ Returns the shared table of a sheet, loading it if this is the first time it is asked for
 
-    for m in d[group_by][1]:
-        df_member = df[df[d[group_by][0]] == m]
-        l.append(df_member)
+            Inputs:
+                (string) - 'sheet_name' : Name of the sheet i.e 'wt_table','mutant_table','samples_info'
+            Outputs:
+                ('Pandas.DataFrame' Class Object) - The shared table, do not write into it
+        """
+        assert sheet_name in sheet_input_range, f"Unknown sheet : {sheet_name}"
+        with self._locks[sheet_name]:
+            if sheet_name not in self.tables:
+                self.tables[sheet_name] = self.loader(sheet_name)
+        return self.tables[sheet_name]
+
+    def prefetch(self, sheet_names=None, max_workers=None):
+        """ Loads every sheet not yet loaded concurrently
+
+            Inputs:
+                (List of Strings or None) - 'sheet_names' : The sheets to load, if None then all the sheets of our DataBase
+                (Int or None) - 'max_workers' : The number of sheets to load at the same time, if None then all of them
+            Outputs:
+                (None)
+        """
+        sheet_names = [i for i in (sheet_names or sheet_input_range)
+                       if not self.is_loaded(i)]
+        if sheet_names:
+            with ThreadPoolExecutor(max_workers=max_workers or len(sheet_names)) as pool:
+                list(pool.map(self.load, sheet_names))
+        return
+
+    def get(self, sheet_name):
+        """ Returns the shared table of a sheet, read-only: new columns go through 'with_columns' or 'assign'
+
+            Inputs:
+                (string) - 'sheet_name' : Name of the sheet i.e 'wt_table','mutant_table','samples_info'
+            Outputs:
+                ('Pandas.DataFrame' Class Object) - The shared table of the sheet
+        """
+        return self.load(sheet_name)
+
+    def copy(self, sheet_name):
+        """ Returns a copy of the table of a sheet which can be written into without altering the shared table
+
+            Inputs:
+                (string) - 'sheet_name' : Name of the sheet i.e 'wt_table','mutant_table','samples_info'
+            Outputs:
+                ('Pandas.DataFrame' Class Object) - A deep copy of the table of the sheet
+        """
+        return self.load(sheet_name).copy(deep=True)
 
-    return l
+    def __getitem__(self, sheet_name):
+        return self.get(sheet_name)
+
+    def is_loaded(self, sheet_name):
+        """ Has the sheet already been materialized
+        """
+        return sheet_name in self.tables
+
+    def clear(self):
+        """ Forget every loaded table so they are loaded again on next access
+        """
+        self.tables = {}
+
+
+def with_columns(df, **columns):
+    """ Returns 'df' with new or replaced columns without writing into 'df'
+            Only the given columns are new, the rest still share memory with 'df': assigning a whole column
+            replaces it in the new DataFrame, so never write into the result in place (i.e with '.loc')
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The Sample Data, WT Data, or Mutant Data from our study
+            (Keyword Arguments) - 'columns' : The name of each column : its values
+        Outputs:
+            ('Pandas.DataFrame' Object Class) - The new DataFrame
+    """
+    df = df.copy(deep=False)
+    for c, values in columns.items():
+        df[c] = values
+    return df
+
+
+def drop_unused_categories(df):
+    """ Forgets the categories of a segment of our data that none of its rows have
+            i.e so plots of one family don't leave room for the colors of other families
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : A segment of the Sample Data, WT Data, or Mutant Data from our study
+        Outputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : The same segment
+    """
+    categorical = [c for c in df.columns if str(df[c].dtype) == 'category']
+    if categorical:
+        # Only the categorical columns are replaced, the rest still share memory with 'df'
+        df = with_columns(
+            df, **{c: df[c].cat.remove_unused_categories() for c in categorical})
+    return df
 
 
 # THE THREE MAIN DATAFRAMES COMPRISING OUR STUDY
-WT_DATA, SAMPLES_DATA, MUTANT_DATA = get_df(), get_df(
-    'samples_info'), get_df('mutant_table')
+DATASETS = DataRegistry()
+# 'WT_DATA', 'SAMPLES_DATA' and 'MUTANT_DATA' are only loaded once they are used, they are the shared read-only tables
+LAZY_TABLES = {
+    'WT_DATA': 'wt_table',
+    'SAMPLES_DATA': 'samples_info',
+    'MUTANT_DATA': 'mutant_table'
+}
+
+
+def __getattr__(name):
+    if name in LAZY_TABLES:
+        return DATASETS.get(LAZY_TABLES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
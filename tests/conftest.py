@@ -0,0 +1,9 @@
+""" conftest.py
+
+Lets the tests import the modules of our program from the top of the repository
+
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
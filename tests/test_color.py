@@ -0,0 +1,213 @@
+""" test_color.py
+
+Tests of the binning of colors
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from color import (DEFAULT_COLORS, ColorBinner, add_color_classifications_from_rbg_code, ciede2000_lower_bound,
+                   closest_bincolor, closest_colour, delta_e_ciede2000, fill_dictionary,
+                   fill_dictionary_with_conflicts, gen_all_classifications, gen_custom_closest, gen_rgb_data,
+                   gen_validated_by_data, get_color_lut, hierarchy_key_columns, parse_rgb_codes,
+                   pair_mutants, relabel_by_key, rgb_to_lab)
+
+
+def brute_force(binner, rgb):
+    dist = delta_e_ciede2000(rgb_to_lab(rgb)[:, None, :], binner.points[None, :, :])
+    return dist.argmin(axis=1)
+
+
+def test_ciede2000_matches_brute_force():
+    rng = np.random.default_rng(0)
+    # Distinct colors so no two bins tie
+    codes = rng.choice(2**24, 2000, replace=False)
+    palette = {f"c{i}": (c >> 16, (c >> 8) & 255, c & 255) for i, c in enumerate(codes)}
+    binner = ColorBinner(palette, metric='ciede2000')
+    rgb = rng.integers(0, 256, (2000, 3))
+    np.testing.assert_array_equal(binner.query_index(rgb), brute_force(binner, rgb))
+
+
+def test_ciede2000_lower_bound_holds():
+    rng = np.random.default_rng(1)
+    lab1 = rgb_to_lab(rng.integers(0, 256, (10000, 3)))
+    lab2 = rgb_to_lab(rng.integers(0, 256, (10000, 3)))
+    d76 = np.linalg.norm(lab1 - lab2, axis=1)
+    assert (delta_e_ciede2000(lab1, lab2) >= ciede2000_lower_bound(lab1, d76)).all()
+
+
+def test_hierarchy_key_columns_are_found_by_name():
+    df = pd.DataFrame(columns=['irr_color', 'labeled_color', 'genotype', 'species'])
+    assert hierarchy_key_columns(df, 'samples_info') == ['species', 'genotype', 'labeled_color', 'irr_color']
+    with pytest.raises(KeyError, match='scale_color_post'):
+        hierarchy_key_columns(df, 'mutant_table')
+
+
+def test_parse_rgb_codes_flags_malformed_and_missing_codes():
+    codes = ['rgb(255,165,0)', 'RGB( 1, 2, 3 )', 'rgb(300,0,999)', np.nan, 'nan', '', 'rgb(1,2)', 'rgb(-1,2,3)',
+             'rgb(1.5,2,3)', 'rgb(1000,0,0)', 'rgb(255,165,0)']
+    rgb, valid = parse_rgb_codes(codes)
+    np.testing.assert_array_equal(valid, [True, True, True, False, False, False, False, False, False, False, True])
+    np.testing.assert_array_equal(rgb[valid], [[255, 165, 0], [1, 2, 3], [300, 0, 999], [255, 165, 0]])
+    assert (rgb[~valid] == 0).all()
+
+
+@pytest.mark.parametrize('use_lut', [False, True])
+def test_out_of_range_codes_are_classified_like_closest_colour(use_lut):
+    df = pd.DataFrame({'rbg_color': ['rgb(300,0,999)', 'rgb(255,165,0)', 'nan']})
+    rv = add_color_classifications_from_rbg_code(df, {'rgb': None}, use_lut=use_lut)
+    assert list(rv['classified_color_rgb']) == [closest_colour((300, 0, 999)), closest_colour((255, 165, 0)), None]
+
+
+@pytest.mark.parametrize('color_bins', [None, DEFAULT_COLORS])
+def test_lookup_table_matches_closest_colour(color_bins, tmp_path):
+    lut, names = get_color_lut(color_bins, str(tmp_path))
+    rng = np.random.default_rng(2)
+    # Both ends of the table and a sample of the codes in between
+    codes = np.concatenate([[0, 2**24 - 1], rng.choice(2**24, 2000, replace=False)])
+    for code, name in zip(codes, names[lut[codes]]):
+        expected = closest_colour((code >> 16, (code >> 8) & 255, code & 255))
+        if color_bins is not None:
+            expected = closest_bincolor(expected, color_bins)
+        assert name == expected
+
+
+def missing_as_none(values):
+    return [None if pd.isna(i) else i for i in values]
+
+
+def test_relabel_by_key_matches_a_scan_per_key():
+    rng = np.random.default_rng(5)
+    keys = pd.Series(rng.choice(['a', 'b', 'c', 'd', None], 500), dtype=object)
+    target = pd.Series(rng.choice(['red', 'blue', None], 500), dtype=object)
+    mapping = {'a': 'blue', 'b': 'green', 'c': None, 'z': 'black'}
+
+    # Relabel the rows of every key one key after another
+    expected = target.copy()
+    for k, v in mapping.items():
+        expected.loc[keys == k] = v
+
+    relabeled = relabel_by_key(keys.astype('category'), target.astype('category'), mapping)
+    assert missing_as_none(relabeled) == missing_as_none(expected)
+
+
+def fill_dictionary_by_rows(df, k, v):
+    # Every value of every key in the order the rows are read, then the keys with one value
+    d = {}
+    for key, val in zip(df[k].tolist(), df[v].tolist()):
+        if key not in d:
+            d[key] = [val]
+        elif val not in d[key]:
+            d[key].append(val)
+    return {key: vals[0] for key, vals in d.items() if len(vals) == 1}, \
+        {key: vals for key, vals in d.items() if len(vals) > 1}
+
+
+@pytest.mark.parametrize('dtype', [object, 'category'])
+def test_fill_dictionary_matches_a_pass_over_the_rows(dtype):
+    rng = np.random.default_rng(6)
+    # Keys in a shuffled order so the order of first appearance is not the sorted one
+    keys = rng.permutation([f"k{i}" for i in range(40)])
+    df = pd.DataFrame({'index': rng.choice(keys, 1000),
+                       'color': rng.choice(['red', 'blue', 'green'], 1000)}).astype(dtype)
+    # Half of the keys only ever have one color
+    single = df['index'].isin(keys[:20])
+    df.loc[single, 'color'] = 'red'
+
+    expected, expected_conflicts = fill_dictionary_by_rows(df, 'index', 'color')
+    d, conflicts = fill_dictionary_with_conflicts(df, 'index', 'color')
+    assert list(d.items()) == list(expected.items())
+    assert fill_dictionary(df, 'index', 'color') == d
+    assert list(conflicts['index']) == list(expected_conflicts)
+    assert [list(i) for i in conflicts['values']] == list(expected_conflicts.values())
+
+
+def pair_mutants_by_species(wt_data, mutant_data):
+    # Walk every mutant index of every species and look up its wt scales one mutation at a time
+    mutant_list, unmatched = [], []
+    for m_sp in mutant_data['species'].unique():
+        df_sp_mutant = mutant_data.loc[mutant_data['species'] == m_sp]
+        df_sp_wt = wt_data.loc[wt_data['species'] == m_sp]
+        for mkey in df_sp_mutant['index'].unique():
+            _, mutated_gene, color_shift = mkey.split(' ')
+            df_geno_mutant = df_sp_mutant.loc[df_sp_mutant['genotype'] == mutated_gene]
+            color_pre, color_post = color_shift.split('->')
+            df_mutant_scales = df_geno_mutant.loc[df_geno_mutant['scale_color_post'] == color_post]
+            wt_indexes = list(df_sp_wt['index'].unique())
+            wt_colors = list(df_sp_wt['scale_color'].unique())
+            wt_index_colors = [i.split(' ')[-1] for i in wt_indexes]
+            if color_pre in wt_colors:
+                df_wt_scales = df_sp_wt.loc[df_sp_wt['scale_color'] == color_pre]
+            elif color_pre in wt_index_colors:
+                correct_index = wt_indexes[wt_index_colors.index(color_pre)]
+                df_wt_scales = df_sp_wt.loc[df_sp_wt['index'] == correct_index]
+            else:
+                unmatched.append(mkey)
+                continue
+            mutant_list.append(pd.concat([df_wt_scales, df_mutant_scales]))
+    for df_mutation in mutant_list:
+        df_mutation.loc[df_mutation['scale_color'].isnull(), 'scale_color'] = df_mutation['scale_color_post']
+    return mutant_list, unmatched
+
+
+def test_pair_mutants_matches_a_walk_over_every_species():
+    # Relabeled wt scales whose color no longer matches the one ending their index
+    wt = pd.DataFrame([('b', 'wt', 'black', 'b wt black'),
+                       ('a', 'wt', 'crimson', 'a wt red'),
+                       ('a', 'wt', 'black', 'a wt black'),
+                       ('a', 'wt', 'crimson', 'a wt red'),
+                       ('a', 'wt2', 'white', 'a wt2 red'),
+                       ('b', 'wt', 'yellow', 'b wt yellow')],
+                      columns=['species', 'genotype', 'scale_color', 'index'])
+    wt['value'] = np.arange(len(wt), dtype=float)
+    mutant = pd.DataFrame([('b', 'optix', None, 'yellow', 'b optix black->yellow'),
+                           ('a', 'optix', None, 'blue', 'a optix red->blue'),
+                           ('a', 'wntA', 'black', 'white', 'a wntA black->white'),
+                           ('a', 'optix', None, 'blue', 'a optix red->blue'),
+                           ('a', 'optix', None, 'green', 'a optix green->green'),
+                           ('b', 'wntA', None, 'red', 'b wntA yellow->red')],
+                          columns=['species', 'genotype', 'scale_color', 'scale_color_post', 'index'],
+                          index=np.arange(100, 106))
+    mutant['value'] = -np.arange(len(mutant), dtype=float)
+
+    expected, expected_unmatched = pair_mutants_by_species(wt, mutant)
+    mutants, unmatched = pair_mutants(wt, mutant)
+    assert len(mutants) == len(expected) == 4
+    for df, df_expected in zip(mutants, expected):
+        pd.testing.assert_frame_equal(df, df_expected, check_dtype=False)
+    assert list(unmatched['index']) == expected_unmatched == ['a optix green->green']
+
+
+def make_classification_frames():
+    samples = pd.DataFrame({'species': ['a', 'a', 'b', 'b', 'b'], 'genotype': ['wt'] * 5,
+                            'labeled_color': ['red', 'black', 'yellow', 'yellow', 'white'],
+                            'irr_color': ['nan', 'nan', 'nan', 'nan', 'blue'],
+                            # The yellow scales of 'b' are classified as two colors
+                            'rbg_color': ['rgb(250,10,10)', 'rgb(10,10,10)', 'rgb(250,250,0)', 'rgb(10,10,250)',
+                                          'rgb(0,0,255)']})
+    wt = pd.DataFrame({'species': ['a', 'a', 'b', 'b', 'c'], 'genotype': ['wt'] * 5,
+                       'scale_color': ['red', 'black', 'yellow', 'white', 'red'],
+                       'irr_color': ['nan', 'nan', 'nan', 'blue', 'nan'], 'value': np.arange(5.0)})
+    mutant = pd.DataFrame({'species': ['a', 'a'], 'genotype': ['optix'] * 2, 'scale_color': ['red', 'black'],
+                           'scale_color_post': ['black', 'white'], 'value': np.arange(2.0)})
+    return samples, wt, mutant
+
+
+def test_all_classifications_match_each_classification():
+    samples, wt, mutant = make_classification_frames()
+    info, wt_all, mutant_all = gen_all_classifications(samples, [(wt, False), (mutant, True)])
+    assert {'classified_color_rgb', 'classified_color_closest', 'classified_color_validated'} <= set(info.columns)
+    assert {'scale_color_rgb', 'scale_color_closest', 'validated', 'scale_color_validated'} <= set(wt_all.columns)
+    assert {'scale_color_post_rgb', 'scale_color_post_closest'} <= set(mutant_all.columns)
+    assert 'validated' not in mutant_all.columns
+
+    for df, all_df, mutants, column in [(wt, wt_all, False, 'scale_color'), (mutant, mutant_all, True, 'scale_color_post')]:
+        _, rgb = gen_rgb_data(samples, df, mutants=mutants)
+        assert missing_as_none(all_df[column + '_rgb']) == missing_as_none(rgb[column])
+        _, closest = gen_custom_closest(samples, df, mutants=mutants)
+        assert missing_as_none(all_df[column + '_closest']) == missing_as_none(closest[column])
+
+    _, validated = gen_validated_by_data(samples, wt)
+    assert list(wt_all.index[wt_all['validated']]) == list(validated.index)
+    assert missing_as_none(wt_all['scale_color_validated']) == \
+        missing_as_none(wt_all['scale_color'].where(wt_all['validated']))
@@ -0,0 +1,155 @@
+""" test_feature_search.py
+
+Tests of the feature set scores and searches
+
+"""
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.decomposition import PCA
+import feature_search
+
+
+def make_df(n_rows=200, n_features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n_rows, n_features)),
+                      columns=[f"f{i}" for i in range(n_features)])
+    df['scale_color'] = rng.choice(['red', 'blue'], n_rows)
+    return df
+
+
+def test_scores_see_writes_in_place():
+    df = make_df()
+    sets = [['f0', 'f1'], ['f2', 'f3']]
+    assert len(feature_search.score_feature_sets(df, sets, 'scale_color', 1)) == 2
+
+    df.loc[:, 'f0'] = np.nan
+    scored = feature_search.score_feature_sets(df, sets, 'scale_color', 1)
+    assert [s for s, _ in scored] == [['f2', 'f3']]
+
+
+def test_complete_case_is_kept_until_written_in_place():
+    df = make_df()
+    index = feature_search.get_missingness_index(df)
+    df_n, X = index.complete_case(df, ['f0', 'f1'], 'scale_color')
+    assert len(df_n) == len(df)
+    assert feature_search.get_missingness_index(df) is index
+    assert index.complete_case(df, ['f0', 'f1'], 'scale_color')[0] is df_n
+
+    df.loc[df.index[:50], 'f1'] = np.nan
+    df_n, X = feature_search.get_missingness_index(df).complete_case(df, ['f0', 'f1'], 'scale_color')
+    assert len(df_n) == len(df) - 50
+    assert X.notna().all().all()
+
+
+def pca_score(df, subset, field, n_components):
+    X = df.loc[df[field].notna(), subset].dropna().to_numpy()
+    return round(sum(PCA(n_components).fit(X).explained_variance_ratio_) * 100, 2)
+
+
+@pytest.mark.parametrize('with_nan', [False, True])
+def test_scores_match_a_pca_fit_of_every_subset(with_nan):
+    df = make_df(n_rows=80)
+    if with_nan:
+        rng = np.random.default_rng(3)
+        for c in df.columns[:-1]:
+            df.loc[rng.choice(len(df), 10, replace=False), c] = np.nan
+    features = list(df.columns[:-1])
+    for k in range(2, len(features) + 1):
+        subsets = [list(s) for s in itertools.combinations(features, k)]
+        expected = [pca_score(df, s, 'scale_color', 2) for s in subsets]
+        scores, _ = feature_search.SubsetScorer(df, features, 'scale_color').score(subsets, 2)
+        # Scores on either side of a rounding boundary may differ by the last digit
+        np.testing.assert_allclose(scores, expected, atol=0.01 + 1e-9)
+        scored = feature_search.score_feature_sets(df, subsets, 'scale_color', 2)
+        assert [s for s, _ in scored] == subsets
+        np.testing.assert_allclose([v for _, v in scored], expected, atol=0.01 + 1e-9)
+
+
+@pytest.mark.parametrize('strategy', ['branch_and_bound', 'beam'])
+def test_searches_find_the_exact_best_set_on_complete_data(strategy):
+    df = make_df(n_rows=120, n_features=8, seed=4)
+    features = list(df.columns[:-1])
+    for k in (2, 3, 5):
+        exact = feature_search.search_feature_sets(df, k, 'scale_color', 1, features)
+        # A beam wide enough to keep every set is an exhaustive search
+        found = feature_search.search_feature_sets(df, k, 'scale_color', 1, features, strategy=strategy,
+                                                   beam_width=100)
+        assert sorted(found[0]) == sorted(exact[0])
+        assert found[1] == exact[1]
+
+
+def make_wide_df(n_rows=300, n_features=60, seed=0):
+    # Every feature is missing on its own tenth of the rows so most sets keep a different number of rows
+    df = make_df(n_rows, n_features, seed)
+    rng = np.random.default_rng(seed + 1)
+    for c in df.columns[:-1]:
+        df.loc[rng.choice(n_rows, n_rows // 10, replace=False), c] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('strategy', ['stream', 'forward', 'backward', 'beam', 'branch_and_bound'])
+def test_tiny_budget_still_returns_a_full_set(strategy):
+    df = make_wide_df()
+    features = list(df.columns[:-1])
+    with pytest.warns(UserWarning, match='stopped early'):
+        best, score = feature_search.search_feature_sets(
+            df, 5, 'scale_color', 2, features, strategy=strategy, max_evals=3)
+    assert len(best) == 5 and len(set(best)) == 5
+    assert np.isfinite(score)
+
+
+def test_backward_stays_within_budget():
+    df = make_wide_df()
+    features = list(df.columns[:-1])
+    scorer = feature_search.SubsetScorer(df, features, 'scale_color')
+    budget = feature_search.SearchBudget(max_evals=100)
+    search = feature_search.FeatureSearch(scorer, 5, 2, budget=budget)
+    search.backward()
+    # The trimmed set may be scored once past the budget
+    assert budget.evals <= 101
+    assert search.best is not None and len(search.best[0]) == 5
+
+
+def test_exact_rejects_a_budget():
+    df = make_df()
+    with pytest.raises(AssertionError):
+        feature_search.search_feature_sets(df, 2, 'scale_color', 1, list(df.columns[:-1]), max_evals=10)
+
+
+def test_no_rows_is_still_an_error():
+    df = make_df()
+    df['f0'] = np.nan
+    df['f1'] = np.nan
+    with pytest.raises(ValueError):
+        feature_search.search_feature_sets(df, 2, 'scale_color', 1, ['f0', 'f1'], strategy='forward')
+
+
+def test_bootstrap_matches_a_pca_fit_of_every_resample():
+    df = make_df(n_rows=120, n_features=5, seed=7)
+    rng = np.random.default_rng(8)
+    for c in df.columns[:-1]:
+        df.loc[rng.choice(len(df), 12, replace=False), c] = np.nan
+    features = list(df.columns[:-1])
+    n_boot, alpha = 40, 0.1
+    report = feature_search.bootstrap_feature_sets(df, 2, 'scale_color', 1, features, n_boot=n_boot, alpha=alpha,
+                                                   seed=3)
+    assert len(report) == 10
+
+    # The same resamples written out row by row
+    weights = feature_search.SubsetScorer(df, features, 'scale_color').resample_weights(0, n_boot, seed=3)
+    scores = np.empty((n_boot, len(report)))
+    for b, w in enumerate(weights):
+        resample = df.iloc[np.repeat(np.arange(len(df)), w.astype(int))]
+        scores[b] = [pca_score(resample, r['features'], 'scale_color', 1) for r in report]
+
+    for r, expected in zip(report, scores.T):
+        assert r['score'] == pytest.approx(pca_score(df, r['features'], 'scale_color', 1), abs=0.01 + 1e-9)
+        low, high = np.percentile(expected, [50 * alpha, 100 - 50 * alpha])
+        assert r['low'] == pytest.approx(low, abs=0.01 + 1e-9)
+        assert r['high'] == pytest.approx(high, abs=0.01 + 1e-9)
+    frequency = np.bincount(scores.argmax(axis=1), minlength=len(report)) / n_boot
+    # A score on a rounding boundary can move one resample to another set
+    np.testing.assert_allclose([r['frequency'] for r in report], frequency, atol=1 / n_boot + 1e-9)
+    assert sum(r['frequency'] for r in report) == pytest.approx(1)
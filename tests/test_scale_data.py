@@ -0,0 +1,230 @@
+""" test_scale_data.py
+
+Tests of the row indexes and fingerprints of our DataFrames
+
+"""
+import os
+import http.server
+import threading
+import time
+import urllib.error
+import numpy as np
+import pandas as pd
+import pytest
+from scale_data import (SHEET_INDEX_COLUMNS, DataRegistry, clean_df, dataset_fingerprint, fetch_sheet, get_df,
+                        get_dfs, get_group_index)
+
+
+def make_df():
+    return pd.DataFrame({'family': ['a', 'b', 'a', 'c'], 'value': [1.0, 2.0, 3.0, 4.0]})
+
+
+def test_group_index_sees_writes_in_place():
+    df = make_df()
+    groups = get_group_index(df).get(df, ('family',))
+    assert sorted(groups) == ['a', 'b', 'c']
+
+    df['family'] = 'x'
+    groups = get_group_index(df).get(df, ('family',))
+    assert list(groups) == ['x']
+    np.testing.assert_array_equal(groups['x'], np.arange(4))
+
+
+def test_fingerprint_changes_with_contents():
+    df = make_df()
+    before = dataset_fingerprint(df)
+    assert dataset_fingerprint(df) == before
+
+    df.loc[0, 'value'] = 10.0
+    assert dataset_fingerprint(df) != before
+
+
+def test_fingerprint_of_columns_ignores_other_columns():
+    df = make_df()
+    before = dataset_fingerprint(df, ['family'])
+    df['value'] = 0.0
+    assert dataset_fingerprint(df, ['family']) == before
+    assert dataset_fingerprint(df, ['value']) != dataset_fingerprint(make_df(), ['value'])
+
+
+def test_registry_shares_one_table():
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        return make_df()
+
+    registry = DataRegistry(loader)
+    table = registry['wt_table']
+    assert registry.get('wt_table') is table
+    assert loads == ['wt_table']
+
+    copy = registry.copy('wt_table')
+    copy.loc[0, 'value'] = -1.0
+    assert table.loc[0, 'value'] == 1.0
+
+
+def make_raw_wt(n_measurements=7):
+    hierarchy = ['family', 'subfamily', 'tribe', 'genus', 'species', 'genotype', 'scale_color', 'Iridescence']
+    raw = pd.DataFrame({c: ['A b', 'A b'] for c in hierarchy})
+    for i in range(n_measurements):
+        raw[f"m{i}"] = ['1.5', 'x']
+    return raw
+
+
+def test_clean_df_names_the_color_columns():
+    df = clean_df(make_raw_wt(), 'wt_table')
+    assert list(df.columns[4:8]) == ['species', 'genotype', 'scale_color', 'irr_color']
+    assert df['irr_color'].tolist() == ['ab', 'ab']
+    assert df['m0'].isna().tolist() == [False, True]
+
+
+def test_clean_df_needs_the_genotype():
+    with pytest.raises(KeyError, match='genotype'):
+        clean_df(make_raw_wt().drop(columns='genotype'), 'wt_table')
+
+
+class SheetHandler(http.server.BaseHTTPRequestHandler):
+    """ Serves whatever 'server.respond(sheet_name, n_requests)' returns: a status and the chunks of the body """
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            status, chunks = server.respond(self.path.strip('/'), len(server.requests))
+            self.send_response(status)
+            self.send_header('Content-Length', str(sum(len(c) for c in chunks)))
+            self.end_headers()
+            for chunk in chunks:
+                self.wfile.write(chunk)
+                self.wfile.flush()
+                time.sleep(server.pause)
+        except OSError:
+            # The client gave up on us
+            pass
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def sheet_server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SheetHandler)
+    server.lock, server.requests, server.active, server.peak, server.pause = threading.Lock(), [], 0, 0, 0
+    server.source = f"http://127.0.0.1:{server.server_address[1]}/{{sheet_name}}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_retries_server_errors(sheet_server):
+    sheet_server.respond = lambda name, n: (503, [b'busy']) if n < 3 else (200, [b'a,b\n', b'1,2\n'])
+    assert fetch_sheet('wt_table', sheet_server.source, backoff=0) == b'a,b\n1,2\n'
+    assert sheet_server.requests == ['/wt_table'] * 3
+
+
+def test_fetch_does_not_retry_client_errors(sheet_server):
+    sheet_server.respond = lambda name, n: (404, [b'no such sheet'])
+    with pytest.raises(urllib.error.HTTPError):
+        fetch_sheet('wt_table', sheet_server.source, backoff=0)
+    assert len(sheet_server.requests) == 1
+
+
+def test_fetch_gives_up_at_the_deadline(sheet_server):
+    sheet_server.respond = lambda name, n: (503, [b'busy'])
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        fetch_sheet('wt_table', sheet_server.source, retries=100, backoff=0.05, deadline=0.5)
+    assert time.monotonic() - start < 2
+
+    # Every read is quicker than the timeout but the whole sheet is not
+    sheet_server.respond = lambda name, n: (200, [b'a'] * 50)
+    sheet_server.pause = 0.05
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        fetch_sheet('wt_table', sheet_server.source, timeout=1, retries=0, deadline=0.5)
+    assert time.monotonic() - start < 2
+
+
+def test_sheets_are_fetched_concurrently(sheet_server, tmp_path):
+    raw = make_raw_wt(n_measurements=13).to_csv(index=False).encode()
+
+    def respond(name, n):
+        time.sleep(0.5)
+        return 200, [raw]
+
+    sheet_server.respond = respond
+    names = ('wt_table', 'samples_info', 'mutant_table')
+    dfs = get_dfs(names, source=sheet_server.source, cache_dir=str(tmp_path), refresh=True, backoff=0)
+    assert sheet_server.peak == 3
+    for name, df in zip(names, dfs):
+        assert set(SHEET_INDEX_COLUMNS[name]) <= set(df.columns)
+        assert len(df) == 2
+
+
+@pytest.fixture
+def sheet_dir(tmp_path):
+    source, cache = tmp_path / 'sheets', tmp_path / 'cache'
+    source.mkdir()
+
+    def write(value):
+        raw = make_raw_wt()
+        raw.loc[0, 'm0'] = value
+        raw.to_csv(source / 'wt_table.csv', index=False)
+
+    write('1.5')
+    return str(source), str(cache), write
+
+
+def first_value(df):
+    return df.loc[0, 'm0']
+
+
+def snapshots(cache):
+    return [f for f in os.listdir(cache) if not f.endswith('.json')]
+
+
+def test_snapshot_is_used_until_it_expires(sheet_dir):
+    source, cache, write = sheet_dir
+    assert first_value(get_df('wt_table', source, cache)) == 1.5
+    write('2.5')
+    assert first_value(get_df('wt_table', source, cache, ttl=3600)) == 1.5
+    assert first_value(get_df('wt_table', source, cache, ttl=0)) == 2.5
+    # The snapshot of the old content is gone
+    assert len(snapshots(cache)) == 1
+
+
+def test_refresh_checks_the_source(sheet_dir):
+    source, cache, write = sheet_dir
+    get_df('wt_table', source, cache)
+    write('2.5')
+    assert first_value(get_df('wt_table', source, cache, ttl=3600, refresh=True)) == 2.5
+    assert len(snapshots(cache)) == 1
+
+
+def test_offline_only_reads_snapshots(sheet_dir):
+    source, cache, write = sheet_dir
+    with pytest.raises(FileNotFoundError):
+        get_df('wt_table', source, cache, offline=True)
+    get_df('wt_table', source, cache)
+    write('2.5')
+    assert first_value(get_df('wt_table', source, cache, ttl=0, offline=True)) == 1.5
+
+
+def test_stale_snapshot_when_the_source_is_gone(sheet_dir):
+    source, cache, write = sheet_dir
+    get_df('wt_table', source, cache)
+    os.remove(os.path.join(source, 'wt_table.csv'))
+    with pytest.warns(UserWarning, match='Could not fetch'):
+        assert first_value(get_df('wt_table', source, cache, ttl=0)) == 1.5
+    # A refresh has to reach the source
+    with pytest.raises(FileNotFoundError):
+        get_df('wt_table', source, cache, refresh=True)
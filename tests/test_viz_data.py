@@ -0,0 +1,102 @@
+""" test_viz_data.py
+
+Tests of the PCA fits and the data behind our visualizations
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import gaussian_kde
+from sklearn.decomposition import PCA
+import viz_data
+
+FEATURES = viz_data.DEF_FEATURES
+
+
+def make_df(n_rows=300, seed=0, shares=(0.6, 0.3, 0.1)):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n_rows, len(FEATURES))), columns=FEATURES)
+    df['scale_color'] = rng.choice(['red', 'blue', 'white'], n_rows, p=shares)
+    df['other'] = 0.0
+    return df
+
+
+def test_pca_cache_hits_and_misses():
+    df = make_df()
+    cache = viz_data.PCACache(size=2)
+    fit = viz_data.fit_pca(df, FEATURES, cache=cache, solver='full')
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert viz_data.fit_pca(df, FEATURES, cache=cache, solver='full') is fit
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_allclose(fit.explained_variance_ratio_,
+                               PCA().fit(df[FEATURES].to_numpy()).explained_variance_ratio_)
+
+    # Other components or features are other fits
+    viz_data.fit_pca(df, FEATURES, n_components=2, cache=cache, solver='full')
+    viz_data.fit_pca(df, FEATURES[:3], cache=cache, solver='full')
+    assert (cache.hits, cache.misses) == (1, 3)
+    # Only two fits are kept, the least recently used one was forgotten
+    assert viz_data.fit_pca(df, FEATURES, cache=cache, solver='full') is not fit
+    assert (cache.hits, cache.misses) == (1, 4)
+
+    # Writing a column the fit doesn't use keeps it, writing one it uses doesn't
+    df['other'] = 1.0
+    viz_data.fit_pca(df, FEATURES[:3], cache=cache, solver='full')
+    assert (cache.hits, cache.misses) == (2, 4)
+    df.loc[0, FEATURES[0]] += 1.0
+    viz_data.fit_pca(df, FEATURES[:3], cache=cache, solver='full')
+    assert (cache.hits, cache.misses) == (2, 5)
+
+
+def test_pca_cache_reads_fits_saved_by_another_run(tmp_path):
+    df = make_df()
+    fit = viz_data.fit_pca(df, FEATURES, cache=viz_data.PCACache(directory=str(tmp_path)), solver='full')
+    cache = viz_data.PCACache(directory=str(tmp_path))
+    saved = viz_data.fit_pca(df, FEATURES, cache=cache, solver='full')
+    assert (cache.hits, cache.misses) == (1, 0)
+    np.testing.assert_array_equal(saved.transformed, fit.transformed)
+
+
+C_MAP = {'red': 'red', 'blue': 'blue', 'white': 'white'}
+
+
+@pytest.fixture
+def shown(monkeypatch):
+    figures = []
+    monkeypatch.setattr(viz_data.render, 'show', lambda fig, name: figures.append(fig))
+    return figures
+
+
+def test_show_originaldim_sample_keeps_the_share_of_every_class(shown):
+    df = make_df(n_rows=2000)
+    viz_data.show_originaldim(df, C_MAP, features=FEATURES[:3], large_mode='sample', max_rows=200)
+    drawn = {trace.name: len(trace.dimensions[0].values) for trace in shown[0].data}
+    expected = {c: round(200 * n / len(df)) for c, n in df['scale_color'].value_counts().items()}
+    assert drawn == expected
+    assert f'({sum(expected.values())} of 2000 scales)' in shown[0].layout.title.text
+
+
+def test_show_originaldim_density_counts_every_row_of_every_class(shown):
+    df = make_df(n_rows=2000)
+    features = FEATURES[:3]
+    viz_data.show_originaldim(df, C_MAP, features=features, large_mode='density', max_rows=200)
+    drawn = {}
+    for trace in shown[0].data:
+        drawn[trace.name] = drawn.get(trace.name, 0) + int(np.sum(trace.text))
+    # Every pair of features counts every row once
+    pairs = len(features) * (len(features) - 1)
+    assert drawn == {c: n * pairs for c, n in df['scale_color'].value_counts().items()}
+
+
+def test_feature_densities_match_gaussian_kde():
+    df = make_df()
+    rng = np.random.default_rng(1)
+    for c in FEATURES:
+        df.loc[rng.choice(len(df), 30, replace=False), c] = np.nan
+    densities = viz_data.feature_densities(df, 'scale_color', FEATURES)
+    for c, cls in enumerate(densities['classes']):
+        for f, feature in enumerate(densities['features']):
+            values = df.loc[df['scale_color'] == cls, feature].dropna().to_numpy()
+            assert densities['counts'][c, f] == len(values)
+            expected = gaussian_kde(values)(densities['grid'][:, f])
+            np.testing.assert_allclose(densities['density'][:, c, f], expected, rtol=1e-6, atol=1e-12)
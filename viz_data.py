@@ -9,15 +9,25 @@ Functions to Visualize the Data
         (10/21/2021)
 
 """
+import os
+import pickle
+import multiprocessing
+import hashlib
 import itertools
+import functools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import color
+import render
+import feature_search
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 import plotly.express as px
-from sklearn.decomposition import PCA
-from scale_data import segment_df_by_field
-from copy import deepcopy
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from sklearn.decomposition import PCA, IncrementalPCA
+from scale_data import segment_df_by_field, iter_segments, dataset_fingerprint, stratified_sample
 
 # These are the default morphometric features of our ultra-structures of diffrent scales
 DEF_FEATURES = [
@@ -30,6 +40,36 @@ DEF_FEATURES = [
     'ridge_elevation'
 ]
 
+# The number of processes analyzing families or mutants at once, 1 to analyze them here one after the other (the default)
+# and None for one per core, parallel analysis is opted into with 'main(max_workers=...)' or SCALE_WORKERS (0 for one per core)
+DEFAULT_WORKERS = int(os.environ.get('SCALE_WORKERS', '1')) or None
+# The number of PCA fits kept in memory, the least recently used one is forgotten first
+PCA_CACHE_SIZE = 128
+# A directory where every PCA fit is also saved and read back from in later runs, None to only keep them in memory
+DEFAULT_PCA_CACHE_DIR = os.environ.get('SCALE_PCA_CACHE_DIR') or None
+# Bump this whenever 'PCAFit' or the way we fit changes so older saved fits are not reused
+PCA_CACHE_VERSION = 1
+# Above this many rows 'show_originaldim' switches to one of its large-data modes
+SCATTER_MAX_ROWS = 5000
+# 'sample' : plot a stratified sample of the rows, 'density' : plot how many rows of each class fall in each bin
+LARGE_DATA_MODES = ['sample', 'density']
+# The number of bins along each feature in the 'density' mode
+DENSITY_BINS = 40
+# The number of points each kernel density of 'feature_distribution' is evaluated at
+KDE_POINTS = 128
+# The number of rows whose kernels are summed at once
+KDE_CHUNK_SIZE = 4096
+# The number of DataFrames whose kernel densities are kept, the oldest is forgotten first
+KDE_CACHE_SIZE = 64
+# How PCAs are fit: 'full' on the whole complete-case matrix, 'incremental' streaming the rows into an IncrementalPCA,
+# 'randomized' with a randomized SVD, 'auto' is 'full' up to PCA_STREAM_ROWS complete rows and 'incremental' above,
+# 'incremental' and 'randomized' fit as 'full' when the complete rows fit in one PCA_CHUNK_SIZE chunk
+PCA_SOLVERS = ['auto', 'full', 'incremental', 'randomized']
+DEFAULT_PCA_SOLVER = os.environ.get('SCALE_PCA_SOLVER', 'auto')
+PCA_STREAM_ROWS = 200000
+# The number of rows read, fit and projected at once outside of the 'full' solver
+PCA_CHUNK_SIZE = 50000
+
 
 def make_title(df):
     """ Make the Title for what all entries in this dataset have in common
@@ -64,25 +104,133 @@ def make_title(df):
     return 'Raw Data'
 
 
-def feature_distribution(df, feature='scale_color'):
+def feature_distribution(df, feature='scale_color', faceted=False):
     """Shows Distributions of Measurements at the 'segby' level grouped by 'feature'
 
         Inputs:
             ('Pandas.DataFrame' Object Class) - 'df' : DataFrame to plot our Morphometric measurements
             (string) - 'feature' : What The Classes should be split up by
+            (Boolean) - 'faceted' : If True draw the violins of every measurement in one figure from the densities of
+                                    'feature_densities', by default a seaborn violin plot per measurement
         Outputs:
             (None) - Plots Violin Plots of Features
     """
     measurements = DEF_FEATURES
+    title = make_title(df)
+    if faceted:
+        t = 'distributions for ' + title
+        render.show(plot_densities(feature_densities(df, feature, measurements), t), t)
+        print('\n')
+        return
     for m in measurements:
         g = sns.violinplot(x=feature, y=m, data=df, width=0.7)
-        t = m + ' ' + 'distribution ' + 'for' + ' ' + make_title(df)
+        t = m + ' ' + 'distribution ' + 'for' + ' ' + title
         g.set(title=t)
-        plt.show()
+        render.show(g.figure, t)
     print('\n')
     return
 
 
+# The kernel densities of the DataFrames seen so far {(fingerprint, field, features, points) : densities}
+_KDE_CACHE = OrderedDict()
+
+
+def feature_densities(df, field='scale_color', features=DEF_FEATURES, points=KDE_POINTS):
+    """ Gaussian kernel density of every feature for every class of 'field', all computed in one pass over the rows
+            Bandwidths follow Scott's rule like seaborn's violin plots, the densities of a DataFrame are kept and reused
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : DataFrame of our Morphometric measurements
+            (string) - 'field' : What The Classes are split up by
+            (List of Strings) - 'features' : The measurements
+            (Int) - 'points' : The number of points each density is evaluated at
+        Outputs:
+            (Dictionary) - {'classes': the classes, 'features': the measurements, 'grid': (points, n_features) values the densities
+                            are evaluated at, 'density': (points, n_classes, n_features) densities, 'counts': (n_classes, n_features) rows}
+    """
+    key = (dataset_fingerprint(df, dict.fromkeys([field] + list(features))), field, tuple(features), points)
+    if key in _KDE_CACHE:
+        _KDE_CACHE.move_to_end(key)
+        return _KDE_CACHE[key]
+
+    codes, classes = df[field].factorize(sort=True)
+    keep = codes >= 0
+    codes = codes[keep]
+    X = df[list(features)].to_numpy(dtype=float)[keep]
+    present = ~np.isnan(X)
+    n_classes = len(classes)
+    onehot = np.zeros((len(codes), n_classes))
+    onehot[np.arange(len(codes)), codes] = 1
+
+    # Scott's rule bandwidth of every class and feature, classes with a single value have no density
+    counts = onehot.T @ present
+    X0 = np.where(present, X, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (onehot.T @ X0) / counts
+        var = (onehot.T @ X0 ** 2 - counts * mean ** 2) / (counts - 1)
+        bw = np.sqrt(np.maximum(var, 0)) * counts ** (-1 / 5)
+    bw = np.where((counts > 1) & (bw > 0), bw, np.nan)
+
+    # Each feature is evaluated on one grid reaching two bandwidths past its values like seaborn's 'cut'
+    reach = 2 * np.nan_to_num(np.nanmax(bw, axis=0, initial=0))
+    lo, hi = np.nanmin(X, axis=0, initial=np.inf), np.nanmax(X, axis=0, initial=-np.inf)
+    lo, hi = np.where(np.isfinite(lo), lo - reach, 0), np.where(np.isfinite(hi), hi + reach, 1)
+    grid = np.linspace(lo, hi, points)
+
+    density = np.zeros((points, n_classes, len(features)))
+    h = bw[codes]
+    usable = present & ~np.isnan(h)
+    for start in range(0, len(codes), KDE_CHUNK_SIZE):
+        part = slice(start, start + KDE_CHUNK_SIZE)
+        hp = np.where(usable[part], h[part], 1.0)
+        z = (grid[:, None, :] - X0[part][None]) / hp[None]
+        k = np.exp(-0.5 * z ** 2) / (hp[None] * np.sqrt(2 * np.pi)) * usable[part][None]
+        density += np.einsum('pnf,nc->pcf', k, onehot[part])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        density = np.nan_to_num(density / counts[None])
+
+    rv = {'classes': list(classes), 'features': list(features),
+          'grid': grid, 'density': density, 'counts': counts}
+    # Forget the oldest densities once the cache is full
+    if len(_KDE_CACHE) >= KDE_CACHE_SIZE:
+        _KDE_CACHE.popitem(last=False)
+    _KDE_CACHE[key] = rv
+    return rv
+
+
+def plot_densities(densities, title, width=0.7, ncols=4):
+    """ Draws the densities of 'feature_densities' as violins, one panel per measurement and one violin per class
+
+        Inputs:
+            (Dictionary) - 'densities' : What 'feature_densities' returned
+            (String) - 'title' : The title of the figure
+            (Float) - 'width' : The widest a violin can be
+            (Int) - 'ncols' : The number of panels in each row
+        Outputs:
+            ('matplotlib.figure.Figure' Object Class) - The figure
+    """
+    classes, features = densities['classes'], densities['features']
+    grid, density = densities['grid'], densities['density']
+    nrows = -(-len(features) // ncols)
+    fig, axes = plt.subplots(nrows, ncols, figsize=(4 * ncols, 3.5 * nrows), squeeze=False)
+    for f, ax in enumerate(axes.ravel()):
+        if f >= len(features):
+            ax.set_visible(False)
+            continue
+        # Every violin of a panel is scaled to the widest so they can be compared like seaborn's 'area' scale
+        half = density[:, :, f] / max(density[:, :, f].max(), 1e-300) * width / 2
+        for c in range(len(classes)):
+            if half[:, c].any():
+                ax.fill_betweenx(grid[:, f], c - half[:, c], c + half[:, c],
+                                 color=f'C{c % 10}', alpha=0.8, linewidth=0.5)
+        ax.set_xticks(range(len(classes)))
+        ax.set_xticklabels([str(c) for c in classes], rotation=45, ha='right')
+        ax.set_title(features[f])
+    fig.suptitle(title)
+    fig.tight_layout()
+    return fig
+
+
 def run_viz_by_field(df, foo, c_map, field, segby='f'):
     """Recursively runs through visualization function 'foo' to our data segmented 'df'
     by a group 'f', running each visualization observing variable 'field' and applies a
@@ -93,7 +241,7 @@ def run_viz_by_field(df, foo, c_map, field, segby='f'):
             ('Function' Python Object Class) - 'foo' : function in viz_data.py that takes a 'color mapping' and 'field' as inputs
             (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visulizations
             (string) - 'field': What Variable to classify the plot against i.e 'scale_color'
-            (string) - what to segment the data by i.e 'f'- by family
+            (string or List of Strings) - what to segment the data by i.e 'f'- by family or ['f','sf','ge'] - by genus within subfamily within family
 
         Outputs:
             (None) - Plots Visualizations
@@ -104,41 +252,106 @@ def run_viz_by_field(df, foo, c_map, field, segby='f'):
         foo(df, c_map=c_map, field=field)
 
     else:
-        l_df = segment_df_by_field(df, segby)
-
-        for d in l_df:
+        for _, d in iter_segments(df, segby):
             foo(d, c_map=c_map, field=field)
     return
 
 
-def show_originaldim(df, c_map, features=DEF_FEATURES, field='scale_color'):
+def show_originaldim(df, c_map, features=DEF_FEATURES, field='scale_color', large_mode='sample', max_rows=SCATTER_MAX_ROWS):
     """Shows original feature distribution of our dataset
     Plots all the diffrent included features and maps the color using a color map.
+    The scatter matrix is drawn with WebGL, above 'max_rows' rows it only draws a sample or the binned density of the rows
+    so the size of the figure stays bounded however many scales there are.
 
         Inputs:
             ('Pandas.DataFrame' Object Class) - 'df' : DataFrame to plot our Morphometric measurements
             (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visulizations
             (List of Strings) - 'features': the column names for the morphometric measurements to be examined
             (String) - 'field': By what column is the data divided by
+            (String) - 'large_mode': One of LARGE_DATA_MODES, how to draw more than 'max_rows' rows
+                                     'sample' : a sample of 'max_rows' rows keeping the share of every class of 'field'
+                                     'density' : the number of rows of each class in each bin of every pair of features
+            (Int) - 'max_rows': The most rows drawn one by one
         Outputs:
             (None)
     """
-
-    fig = px.scatter_matrix(
-        df,
-        dimensions=features,
-        color=field,
-        title=make_title(df) + ' - Original Dimension',
-        color_discrete_map=c_map
-    )
-
-    fig.update_traces(diagonal_visible=False)
-    fig.show()
+    assert large_mode in LARGE_DATA_MODES, f"Unknown large-data mode : {large_mode}"
+    title = make_title(df) + ' - Original Dimension'
+    if large_mode == 'density' and len(df) > max_rows:
+        fig = binned_scatter_matrix(df, c_map, features, field, title)
+    else:
+        shown = stratified_sample(df, field, max_rows)
+        if len(shown) < len(df):
+            title += f' ({len(shown)} of {len(df)} scales)'
+        # Scatter matrices are drawn as WebGL 'splom' traces
+        fig = px.scatter_matrix(
+            shown,
+            dimensions=features,
+            color=field,
+            title=title,
+            color_discrete_map=c_map
+        )
+        fig.update_traces(diagonal_visible=False)
+    render.show(fig, title)
     print('\n')
     return
 
 
-def PCA_3D(df, c_map, features=DEF_FEATURES, field='scale_color'):
+def binned_scatter_matrix(df, c_map, features=DEF_FEATURES, field='scale_color', title='', bins=DENSITY_BINS):
+    """ Scatter matrix of the binned rows: every pair of features is split into 'bins' x 'bins' cells and each class of
+        'field' gets one WebGL marker per cell it has rows in, sized by how many. The figure holds at most
+        bins * bins markers per class and pair of features whatever the number of rows.
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df' : DataFrame to plot our Morphometric measurements
+            (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visulizations
+            (List of Strings) - 'features': the column names for the morphometric measurements to be examined
+            (String) - 'field': By what column is the data divided by
+            (String) - 'title': The title of the figure
+            (Int) - 'bins': The number of bins along each feature
+        Outputs:
+            ('plotly.graph_objects.Figure' Object Class) - The figure
+    """
+    # The class of every row, -1 where it has none
+    classes, labels = df[field].factorize()
+    labels = list(labels)
+    keep = classes >= 0
+    X = df[features].to_numpy(dtype=float)[keep]
+    classes = classes[keep]
+    # The bin of every value along its feature, -1 where it is missing
+    lo, hi = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+    width = np.where(hi > lo, (hi - lo) / bins, 1.0)
+    with np.errstate(invalid='ignore'):
+        at = np.clip(np.floor((X - lo) / width), 0, bins - 1)
+    at = np.where(np.isnan(X), -1, at).astype(np.int64)
+
+    d, n_classes = len(features), len(labels)
+    counts = {}
+    for i, j in itertools.permutations(range(d), 2):
+        ok = (at[:, i] >= 0) & (at[:, j] >= 0)
+        cell = (classes[ok] * bins + at[ok, i]) * bins + at[ok, j]
+        counts[i, j] = np.bincount(cell, minlength=n_classes * bins * bins).reshape(n_classes, bins, bins)
+    largest = max([c.max() for c in counts.values()] + [1])
+
+    fig = make_subplots(rows=d, cols=d, horizontal_spacing=0.01, vertical_spacing=0.01)
+    for (i, j), count in counts.items():
+        for c, label in enumerate(labels):
+            bx, by = np.nonzero(count[c])
+            fig.add_trace(go.Scattergl(
+                x=lo[i] + (bx + 0.5) * width[i], y=lo[j] + (by + 0.5) * width[j], mode='markers',
+                marker=dict(size=3 + 12 * np.sqrt(count[c, bx, by] / largest),
+                            color=c_map.get(label) if c_map else None),
+                name=str(label), legendgroup=str(label), showlegend=(i, j) == (1, 0),
+                text=count[c, bx, by], hovertemplate='%{text} scales'
+            ), row=j + 1, col=i + 1)
+    for k, feature in enumerate(features):
+        fig.update_xaxes(title_text=feature, row=d, col=k + 1)
+        fig.update_yaxes(title_text=feature, row=k + 1, col=1)
+    fig.update_layout(title=title)
+    return fig
+
+
+def PCA_3D(df, c_map, features=DEF_FEATURES, field='scale_color', fit=None):
     """ Makes a 3-component PCA of data given, Dimensional Reduction to 3 dimensions
 
         Inputs:
@@ -146,21 +359,21 @@ def PCA_3D(df, c_map, features=DEF_FEATURES, field='scale_color'):
             (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visualizations
             (List of Strings) - 'features': the column names for the morphometric measurements to be examined
             (String) - 'field': What is the target variable in the dataset
+            (PCAFit or None) - 'fit': The 3-component PCA already fit on 'df', if None then it is fit here
         Outputs:
             (None)
     """
-    df_n, X = resize_data(df, features, field)
-    if type(df_n) != int:
-        pca = PCA(n_components=3)
-        components = pca.fit_transform(X)
+    if fit is None:
+        fit = fit_pca(df, features, field, 3)
+    if fit is not None:
         fig = px.scatter_3d(
-            components, x=0, y=1, z=2, color=df_n[field],
+            fit.transformed, x=0, y=1, z=2, color=fit.labels,
             title='3-Component PCA : ' + make_title(df),
             labels={'0': 'PC1', '1': 'PC2', '2': 'PC3'},
             color_discrete_map=c_map
         )
-        fig.show()
-        print_axis_components(pca, features)
+        render.show(fig, fig.layout.title.text)
+        print_axis_components(fit, features)
         print('\n')
         return
 
@@ -169,7 +382,7 @@ def print_axis_components(pca, features):
     """ For a PCA model list the number of components and show the normalized wheights of each of the features.
 
         Inputs:
-            ('sklearn.decomposition._pca.PCA' Object Class) - 'pca' : The principle component axes
+            ('sklearn.decomposition._pca.PCA' Object Class or PCAFit) - 'pca' : The principle component axes
             (List of Strings) - 'features': The column names of the features making up the axes
         Outputs:
             (None)
@@ -184,7 +397,7 @@ def print_axis_components(pca, features):
     print('\n')
 
 
-def mk_explained_variance_curve(df, features=DEF_FEATURES, field='scale_color'):
+def mk_explained_variance_curve(df, features=DEF_FEATURES, field='scale_color', fit=None):
     """ Given The Data Set and features how much vairance is explaied per number of principle of component
         axes added
 
@@ -192,28 +405,27 @@ def mk_explained_variance_curve(df, features=DEF_FEATURES, field='scale_color'):
             ('Pandas.DataFrame' Object Class) - 'df': The DataFrame to plot our morphometric measurements
             (List of Strings) - 'features': the column names for the morphometric measurements to be examined
             (String) - 'field': What is the target variable in the dataset
+            (PCAFit or None) - 'fit': The PCA of every component already fit on 'df', if None then it is fit here
         Outputs:
             (None)
     """
-    df_n, X = resize_data(df, features, field)
-    if type(df_n) != int:
+    if fit is None:
+        fit = fit_pca(df, features, field)
+    if fit is not None:
 
-        pca = PCA()
-        pca.fit(X)
-
-        exp_var_cumul = np.cumsum(pca.explained_variance_ratio_)
+        exp_var_cumul = np.cumsum(fit.explained_variance_ratio_)
         fig = px.area(
             x=range(1, exp_var_cumul.shape[0] + 1),
             y=exp_var_cumul,
             labels={"x": "# Components", "y": "Explained Variance"},
             title=make_title(df) + " PCA's  of N-dimensions"
         )
-        fig.show()
+        render.show(fig, fig.layout.title.text)
         print('\n')
     return
 
 
-def Load_Features(df, c_map, features=DEF_FEATURES, field='scale_color'):
+def Load_Features(df, c_map, features=DEF_FEATURES, field='scale_color', fit=None):
     """ Creates a 2D PCA and Shows you the vector components of features to each axis.
 
         Inputs:
@@ -221,18 +433,18 @@ def Load_Features(df, c_map, features=DEF_FEATURES, field='scale_color'):
             (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visulizations
             (List of Strings) - 'features': the column names for the morphometric measurements to be examined
             (String) - 'field': What is the target variable in the dataset
+            (PCAFit or None) - 'fit': The 2-component PCA already fit on 'df', if None then it is fit here
         Outputs:
             (None)
     """
-    df_n, X = resize_data(df, features, field)
-    if type(df_n) != int:
-        pca = PCA(n_components=2)
-        components = pca.fit_transform(X)
+    if fit is None:
+        fit = fit_pca(df, features, field, 2)
+    if fit is not None:
         # Get the contributions of each feature in the PC1,PC2 plane
-        loadings = pca.components_.T * np.sqrt(pca.explained_variance_)
+        loadings = fit.loadings
         # Make The Figure
-        fig = px.scatter(components, x=0, y=1, title='2-Component PCA : ' + make_title(df), labels={
-                         '0': 'PC1', '1': 'PC2'}, color=df_n[field], color_discrete_map=c_map)
+        fig = px.scatter(fit.transformed, x=0, y=1, title='2-Component PCA : ' + make_title(df), labels={
+                         '0': 'PC1', '1': 'PC2'}, color=fit.labels, color_discrete_map=c_map)
         # Show the Feature Contribution to PC1 & PC2
         for i, feature in enumerate(features):
             fig.add_shape(
@@ -249,11 +461,226 @@ def Load_Features(df, c_map, features=DEF_FEATURES, field='scale_color'):
                 yanchor="bottom",
                 text=feature,
             )
-        fig.show()
-        print_axis_components(pca, features)
+        render.show(fig, fig.layout.title.text)
+        print_axis_components(fit, features)
         print('\n')
     return
 
+
+class PCAFit:
+    """
+        What the visualizations need of a PCA fit on the complete rows of a DataFrame, without the DataFrame itself.
+        The attributes are named like those of 'sklearn.decomposition.PCA' so a fit can stand in for one,
+        it is small enough to be sent back from the process that made it.
+
+        attr :: self.features - The features the PCA was fit on
+        attr :: self.labels - 'Pandas.Series' of the target variable of every complete row
+        attr :: self.transformed - numpy.ndarray (n_rows, n_components) of the coordinates of every complete row on the PCA axes
+        attr :: self.components_ - numpy.ndarray (n_components, n_features) of the PCA axes
+        attr :: self.explained_variance_ - numpy.ndarray of the variance along each axis
+        attr :: self.explained_variance_ratio_ - numpy.ndarray of the fraction of the variance along each axis
+    """
+
+    def __init__(self, pca, features, labels, transformed):
+        """ PCAFit Constructor
+
+            param :: 'pca' - 'sklearn.decomposition._pca.PCA' Object Class already fit
+            param :: 'features' - List of the features the PCA was fit on
+            param :: 'labels' - 'Pandas.Series' of the target variable of the rows it was fit on
+            param :: 'transformed' - numpy.ndarray of the rows on the PCA axes
+        """
+        self.features = list(features)
+        self.labels = labels
+        self.transformed = transformed
+        self.components_ = pca.components_
+        self.explained_variance_ = pca.explained_variance_
+        self.explained_variance_ratio_ = pca.explained_variance_ratio_
+
+    @property
+    def loadings(self):
+        """ The contribution of each feature to each PCA axis, (n_features, n_components)
+        """
+        return self.components_.T * np.sqrt(self.explained_variance_)
+
+
+class PCACache:
+    """
+        PCA fits keyed by the content of the DataFrame, the features, the number of components and the target,
+        so each PCA is only fit once per run. Once more than 'self.size' fits are kept the least recently used
+        one is forgotten. Given a directory every fit is also saved there and read back in later runs.
+
+        attr :: self.size - The most fits kept in memory
+        attr :: self.directory - Where fits are saved or None to only keep them in memory
+        attr :: self.fits - OrderedDict of {key : PCAFit or None} from the least to the most recently used
+        attr :: self.hits, self.misses - How many fits were found and how many had to be made
+    """
+
+    def __init__(self, size=PCA_CACHE_SIZE, directory=DEFAULT_PCA_CACHE_DIR):
+        """ PCACache Constructor
+
+            param :: 'size' - Int, the most fits kept in memory
+            param :: 'directory' - String or None, where fits are saved between runs
+        """
+        self.size = size
+        self.directory = directory
+        self.fits = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, df, features, n_components, field, solver='full'):
+        """ Returns the key of a fit: (fingerprint of the columns used, features, n_components, field, solver)
+        """
+        columns = dict.fromkeys(list(features) + [field])
+        return dataset_fingerprint(df, columns), tuple(features), n_components, field, solver
+
+    def path(self, key):
+        """ Returns the file a fit is saved to
+        """
+        name = hashlib.sha256(repr((PCA_CACHE_VERSION,) + key).encode()).hexdigest()
+        return os.path.join(self.directory, name + '.pickle')
+
+    def get(self, key):
+        """ Looks a fit up in memory then on disk
+
+            Inputs:
+                (Tuple) - 'key' : The key of the fit (see 'key')
+            Outputs:
+                (Tuple) - (Boolean) was the fit found, (PCAFit or None) the fit
+        """
+        if key in self.fits:
+            self.fits.move_to_end(key)
+            self.hits += 1
+            return True, self.fits[key]
+        if self.directory is not None:
+            try:
+                with open(self.path(key), 'rb') as f:
+                    fit = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                self.hits += 1
+                self.remember(key, fit)
+                return True, fit
+        self.misses += 1
+        return False, None
+
+    def put(self, key, fit):
+        """ Keeps a fit in memory and saves it to disk
+        """
+        self.remember(key, fit)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write next to the target and move it into place so readers never see half a file
+            path = self.path(key)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump(fit, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+
+    def remember(self, key, fit):
+        """ Keeps a fit in memory, forgetting the least recently used ones once the cache is full
+        """
+        self.fits[key] = fit
+        self.fits.move_to_end(key)
+        while len(self.fits) > self.size:
+            self.fits.popitem(last=False)
+
+    def clear(self):
+        """ Forgets every fit kept in memory, saved fits stay on disk
+        """
+        self.fits = OrderedDict()
+
+
+# The PCA fits of this run shared by every visualization
+PCA_CACHE = PCACache()
+
+
+def fit_pca(df, features=DEF_FEATURES, field='scale_color', n_components=None, cache=PCA_CACHE, solver=DEFAULT_PCA_SOLVER):
+    """ Fits a PCA on the complete rows of the features and target, or returns the same fit made before
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df': The DataFrame of our morphometric measurements
+            (List of Strings) - 'features': the column names for the morphometric measurements to be examined
+            (String) - 'field': What is the target variable in the dataset
+            (Int or None) - 'n_components': The number of PCA axes, if None then one per feature
+            (PCACache or None) - 'cache': Where fits are looked up and kept, if None then the PCA is always fit
+            (String) - 'solver': One of PCA_SOLVERS
+        Outputs:
+            (PCAFit or None) - The fit, None if there are no complete rows
+    """
+    assert solver in PCA_SOLVERS, f"Unknown PCA solver : {solver}"
+    rows = None
+    if solver != 'full':
+        # The complete rows are counted from the missingness bits without building the matrix
+        rows = feature_search.get_missingness_index(
+            df).complete_rows(df, list(features) + [field])
+        if solver == 'auto':
+            solver = 'incremental' if len(rows) > PCA_STREAM_ROWS else 'full'
+        elif len(rows) <= PCA_CHUNK_SIZE:
+            # Rows that fit in one chunk are fit whole, an IncrementalPCA can't fit fewer rows than components
+            solver = 'full'
+    if cache is not None:
+        key = cache.key(df, features, n_components, field, solver)
+        found, fit = cache.get(key)
+        if found:
+            return fit
+
+    fit = None
+    if solver == 'full':
+        df_n, X = resize_data(df, features, field)
+        if type(df_n) != int:
+            pca = PCA(n_components=n_components)
+            transformed = pca.fit_transform(X)
+            fit = PCAFit(pca, features, df_n[field], transformed)
+    elif len(rows):
+        fit = fit_pca_chunked(df, rows, features, field, n_components, solver)
+    if cache is not None:
+        cache.put(key, fit)
+    return fit
+
+
+def fit_pca_chunked(df, rows, features, field, n_components, solver='incremental'):
+    """ Fits a PCA on the complete rows, reading and projecting them chunk by chunk
+            'incremental' streams every chunk into an IncrementalPCA so memory stays flat whatever the number of rows,
+            'randomized' fits a randomized SVD on the whole complete-case matrix (so it is held in memory once),
+            quicker than the full SVD for tall matrices, only its projection is chunked
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df': The DataFrame of our morphometric measurements
+            (numpy.ndarray) - 'rows': The positions of the complete rows of the features and target
+            (List of Strings) - 'features': the column names for the morphometric measurements to be examined
+            (String) - 'field': What is the target variable in the dataset
+            (Int or None) - 'n_components': The number of PCA axes, if None then one per feature,
+                                            never more than the number of rows or features
+            (String) - 'solver': 'incremental' or 'randomized'
+        Outputs:
+            (PCAFit) - The fit
+    """
+    features = list(features)
+    columns = df.columns.get_indexer(features)
+    n = min(n_components or len(features), len(rows), len(features))
+    # Chunks of about the same size, none with fewer rows than components
+    chunks = np.array_split(rows, max(1, min(-(-len(rows) // PCA_CHUNK_SIZE), len(rows) // n)))
+
+    def read(chunk):
+        # Only the rows and features of one chunk are copied out of 'df'
+        return df.iloc[chunk, columns].to_numpy(dtype=float)
+
+    if solver == 'incremental':
+        pca = IncrementalPCA(n_components=n)
+        for chunk in chunks:
+            pca.partial_fit(read(chunk))
+    else:
+        pca = PCA(n_components=n, svd_solver='randomized', random_state=0)
+        pca.fit(read(rows))
+
+    transformed = np.empty((len(rows), len(pca.components_)))
+    start = 0
+    for chunk in chunks:
+        transformed[start:start + len(chunk)] = pca.transform(read(chunk))
+        start += len(chunk)
+    return PCAFit(pca, features, df[field].iloc[rows], transformed)
+
 # FEATURE NORMALIZATION AND DATA FORMATING ~ DROP EMPTY ROWS FOR CLEAN PROCESSING
 
 
@@ -267,20 +694,10 @@ def resize_data(df, features, field):
         Outputs:
             (tuple) - 'df_n', 'X' : The new resized data, the indicator variables columns from the resized data
     """
-    # seperate target and predictor variables
-    r = features + [field]
-    df_n = df[r]
     # Drop any rows with empty data ===> YES THIS SKEWS OUR DATA A LOT TOWARDS PLANAR FEATURES
-    df_n = df_n.dropna()
-    X = df_n[features]
-    M = X.to_numpy()
-    n, _ = M.shape
-    # Stoping condition if no PCA can be made
-    if n <= 0:
-        return 0, 0
-    # RETURN AN ARRAY OF THE DATA
-    else:
-        return df_n, X
+    # The complete rows come from the missingness bits of 'df' and are kept for the next call on the same features
+    # Stoping condition if no PCA can be made : (0, 0)
+    return feature_search.get_missingness_index(df).complete_case(df, features, field)
 
 
 # GET ALL POSSIBLE SUBSETS OF FEATURES
@@ -300,7 +717,8 @@ def get_all_possible_combinations(features=DEF_FEATURES):
 
 
 # GET THE BEST POSSIBLE FEATURE SET AND DISPLAY IT
-def optimize_feature_set(df, c_map, num_features=2, field='scale_color', opt_to_n_components=2):
+def optimize_feature_set(df, c_map, num_features=2, field='scale_color', opt_to_n_components=2, features=DEF_FEATURES, min_rows=1,
+                         strategy='exact', beam_width=8, max_evals=None, max_time=None, bootstrap=0, alpha=0.05):
     """ Return The best Set of  Features given the input feature sets and the desired data
 
         Inputs:
@@ -308,52 +726,157 @@ def optimize_feature_set(df, c_map, num_features=2, field='scale_color', opt_to_
             (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visulizations
             (Int) - 'num_features' : The fixed number of ultra-structure features the PCA axes can be constructed from
             (Int) - 'opt_to_n_components': The number of components the PCA can have for which the features are optimized to.
+            (List of Strings) - 'features': The morphometric features to choose from
+            (Int) - 'min_rows': Feature sets with fewer complete rows than this are not considered
+            (String) - 'strategy': How the feature sets are searched, one of feature_search.SEARCH_STRATEGIES
+                                   'exact' scores every set, the others stay interactive with many features to choose from
+            (Int) - 'beam_width': The number of feature sets kept at each step of the 'beam' search
+            (Int or None) - 'max_evals': The most feature sets the search may score (not with 'exact', use 'stream')
+            (Float or None) - 'max_time': The most seconds the search may take (not with 'exact', use 'stream')
+            (Int) - 'bootstrap': The number of resamples of the rows the best feature sets are scored on again, 0 for none
+                                 prints how often each set is selected and the confidence interval of its score
+            (Float) - 'alpha': The confidence intervals cover 1 - 'alpha' of the resampled scores
         Outputs:
             (List of Strings) - Best Feature Sub-Set given selection methedology
     """
     assert opt_to_n_components in set(
         [2, 3]), 'Reductions above 3 dimensions and below 2 dimensions are not possible '
-    # Change Up the conditions so our Data is still Meaningful
-    feature_sets = [x for x in get_all_possible_combinations()
-                    if len(x) == num_features]
-    # Optimize:  find a local max in feature sets, value given all possible combinations
-    # Get a way to store ~ (feature_list,pca_explained_vairance_ratio)
-    rv = [None]*len(feature_sets)
-    # Fill rv[i] with values of explained variance score of feature_sets[i]
-    for i, fset in enumerate(feature_sets):
-        try:
-            # Here we generate the 'Samples Data', 'Wilde Type Data', and  'Mutant Data'
-            data = deepcopy(df)
-            df_n, X = resize_data(data, fset, field)
-            if type(df_n) != int:
-                pca = PCA(n_components=opt_to_n_components)
-                pca.fit_transform(X)
-                score = round(sum(list(pca.explained_variance_ratio_))*100, 2)
-                entry = fset, score
-                rv[i] = entry
-        except:
-            entry = fset, 0.0
-            rv[i] = entry
-            continue
-    # Remove any entries that failed to write into our storage
-    rv = [i for i in rv if i != None]
-    # get the best feature set in  pair tuples filling rv with lambda function
-    best_entry = max(rv, key=lambda i: i[1])
-    best_features, _ = best_entry
+    # Optimize:  find a local max in feature sets, 'exact' values all possible combinations
+    # Every (feature_list,pca_explained_vairance_ratio) is scored from the covariance of the data without fitting a PCA
+    search = dict(strategy=strategy, beam_width=beam_width,
+                  max_evals=max_evals, max_time=max_time, min_rows=min_rows)
+    if bootstrap:
+        # The candidates come best first so the best one is the set the search selects
+        report = feature_search.bootstrap_feature_sets(
+            df, num_features, field, opt_to_n_components, features, n_boot=bootstrap, alpha=alpha, **search)
+        print_bootstrap_report(report, bootstrap, alpha)
+        best_features = report[0]['features']
+    else:
+        best_features, _ = feature_search.search_feature_sets(
+            df, num_features, field, opt_to_n_components, features, **search)
+    show_feature_set(df, c_map, best_features, field, opt_to_n_components)
+    return best_features
+
+
+def print_bootstrap_report(report, n_boot, alpha=0.05):
+    """ Lists how stable each of the best feature sets is over the resamples of 'feature_search.bootstrap_feature_sets'
+
+        Inputs:
+            (List of Dictionaries) - 'report': What 'feature_search.bootstrap_feature_sets' returned
+            (Int) - 'n_boot': The number of resamples
+            (Float) - 'alpha': The confidence intervals cover 1 - 'alpha' of the resampled scores
+        Outputs:
+            (None)
+    """
+    print('~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~')
+    print(f"~ BOOTSTRAP STABILITY : {n_boot} resamples, {round((1 - alpha) * 100)}% intervals ~")
+    for entry in report:
+        print(f"{entry['features']} : {entry['score']} [{entry['low']}, {entry['high']}]"
+              f" selected {round(entry['frequency'] * 100, 1)}%")
+    print('~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~')
+    print('\n')
+
+
+def show_feature_set(df, c_map, best_features, field='scale_color', opt_to_n_components=2, fit=None, curve=None):
+    """ Shows the PCA of the best feature set found by 'optimize_feature_set' and how its explained variance grows
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df': The DataFrame to plot our morphometric measurements
+            (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visulizations
+            (List of Strings) - 'best_features': The selected features
+            (String) - 'field': What is the target variable in the dataset
+            (Int) - 'opt_to_n_components': The number of components the features were optimized to
+            (PCAFit or None) - 'fit', 'curve': The PCA of 'opt_to_n_components' and of every component already fit, if None they are fit here
+        Outputs:
+            (None)
+    """
     # Run appropriate visualizations
     if opt_to_n_components == 2:
         # Show The Loaded PCA
-        Load_Features(df, c_map, best_features, field)
+        Load_Features(df, c_map, best_features, field, fit)
     else:
         # Show a 3D model PCA
-        PCA_3D(df, c_map, best_features, field)
+        PCA_3D(df, c_map, best_features, field, fit)
 
     print(
-        f" The {num_features} features selected to optimize for {opt_to_n_components} components in the data provided is : {best_features}")
+        f" The {len(best_features)} features selected to optimize for {opt_to_n_components} components in the data provided is : {best_features}")
     # Show How Explained Variance Grows with added axes
-    mk_explained_variance_curve(df, best_features, field)
+    mk_explained_variance_curve(df, best_features, field, curve)
+    return
 
-    return best_features
+
+# PARALLEL ANALYSIS ~ FIT EVERY FAMILY OR MUTANT IN ITS OWN PROCESS, SHOW THE RESULTS HERE IN ORDER
+
+
+def analyze_segment(df, num_features, field='scale_color', opt_to_n_components=2, features=DEF_FEATURES, search=None):
+    """ Makes every fit the analysis of one family or mutant shows, without showing anything
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df': The DataFrame of one family or mutant
+            (Int) - 'num_features': The fixed number of ultra-structure features the PCA axes can be constructed from
+            (String) - 'field': What is the target variable in the dataset
+            (Int) - 'opt_to_n_components': The number of components the features are optimized to
+            (List of Strings) - 'features': The morphometric features to choose from
+            (Dictionary or None) - 'search': Keyword arguments of 'feature_search.search_feature_sets' i.e {'strategy': 'beam'}
+        Outputs:
+            (Dictionary) - {'loadings': PCAFit of the 2D PCA of 'features', 'best_features': the selected features,
+                            'fit': PCAFit of the selected features, 'curve': PCAFit of every component of the selected features}
+    """
+    best_features, _ = feature_search.search_feature_sets(
+        df, num_features, field, opt_to_n_components, features, **(search or {}))
+    return {
+        'loadings': fit_pca(df, features, field, 2),
+        'best_features': best_features,
+        'fit': fit_pca(df, best_features, field, opt_to_n_components),
+        'curve': fit_pca(df, best_features, field)
+    }
+
+
+def iter_analyses(segments, num_features, max_workers=DEFAULT_WORKERS, **kwargs):
+    """ Analyzes every segment in a pool of processes, yielding each result in the order of 'segments' as soon as it is ready
+
+        Inputs:
+            (List of 'Pandas.DataFrame' Object Classes) - 'segments': The families or mutants to analyze
+            (Int) - 'num_features': The fixed number of ultra-structure features the PCA axes can be constructed from
+            (Int or None) - 'max_workers': The number of processes, None for one per core and 1 to analyze them in this process
+            (Keyword Arguments) - 'kwargs': The other arguments of 'analyze_segment'
+        Outputs:
+            (Generator of Dictionaries) - The result of 'analyze_segment' for each segment
+    """
+    analyze = functools.partial(
+        analyze_segment, num_features=num_features, **kwargs)
+    if max_workers == 1 or len(segments) <= 1:
+        yield from map(analyze, segments)
+        return
+    # Figures of earlier segments are written by threads while the pool starts, a forked process could inherit
+    # their locks held, so the workers are started fresh instead
+    with ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count() or 1, len(segments)),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield from pool.map(analyze, segments)
+
+
+def show_segment(df, c_map, result, features=DEF_FEATURES, field='scale_color', opt_to_n_components=2):
+    """ Shows the analysis of one family or mutant from the fits of 'analyze_segment'
+
+        Inputs:
+            ('Pandas.DataFrame' Object Class) - 'df': The DataFrame of the family or mutant
+            (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visulizations
+            (Dictionary) - 'result': What 'analyze_segment' returned for 'df'
+            (List of Strings) - 'features': The morphometric features the segment was analyzed on
+            (String) - 'field': What is the target variable in the dataset
+            (Int) - 'opt_to_n_components': The number of components the features were optimized to
+        Outputs:
+            (List of Strings) - The selected features
+    """
+    # Violin Plot
+    feature_distribution(df)
+    # 2D PCA
+    Load_Features(df, c_map, features, field, result['loadings'])
+    # Optimization
+    show_feature_set(df, c_map, result['best_features'], field,
+                     opt_to_n_components, result['fit'], result['curve'])
+    show_originaldim(df, c_map, result['best_features'], field)
+    return result['best_features']
 
 
 def full_data_analysis(data, c_map, optimize_to_n_features=3):
@@ -377,34 +900,33 @@ def full_data_analysis(data, c_map, optimize_to_n_features=3):
     return
 
 
-def family_analysis(wt_data, c_map, num_features=3):
+def family_analysis(wt_data, c_map, num_features=3, max_workers=DEFAULT_WORKERS):
     """ Runs Family by Family analysis 
 
         Inputs:
             ('Pandas.DataFrame' Object Class) - 'df': The DataFrame to plot our morphometric measurements (WT ONLY)
             (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visulizations
             (Int) - 'num_features': The fixed number of ultra-structure features the PCA axes can be constructed from
+            (Int or None) - 'max_workers': The number of families fit at once, None for one per core and 1 for one after the other
         Outputs:
             (None)
 
     """
-    # Segment Data By Family and Apply Desired Functions
+    # Segment Data By Family, every family is fit in its own process and shown here in order
     fams = segment_df_by_field(wt_data, 'f')
-    for fam in fams:
-        feature_distribution(fam)
-        Load_Features(fam, c_map)
-        top_features = optimize_feature_set(fam, c_map, num_features)
-        show_originaldim(fam, c_map, top_features)
+    for fam, result in zip(fams, iter_analyses(fams, num_features, max_workers)):
+        show_segment(fam, c_map, result)
         print('\n')
     return
 
 
-def wt_analysis(data, n_features):
+def wt_analysis(data, n_features, max_workers=DEFAULT_WORKERS):
     """ Runs The Wilde Type Analysis part of our program
 
         Inputs:
             ('Pandas.DataFrame' Object Class) - 'data': The DataFrame to plot our morphometric measurements (WT ONLY)
             (Int) - 'n_features': The fixed number of ultra-structure features the PCA axes can be constructed from
+            (Int or None) - 'max_workers': The number of families fit at once (see 'family_analysis')
         Outputs:
             (None)
     """
@@ -418,30 +940,31 @@ def wt_analysis(data, n_features):
     full_data_analysis(data, cmap, n_features)
     print('\n')
     print('*** FAMILY ANALYSIS ***')
-    family_analysis(data, cmap, num_features=n_features)
+    family_analysis(data, cmap, num_features=n_features, max_workers=max_workers)
     return
 
 
-def mutant_analysis(wt_data, mutant_data, N):
+def mutant_analysis(wt_data, mutant_data, N, max_workers=DEFAULT_WORKERS):
     """ Runs the Mutant analysis part of our program
 
         Inputs:
             ('Pandas.DataFrame' Object Class) - 'wt_data': The DataFrame of morphometric measurements (WT ONLY)
             ('Pandas.DataFrame' Object Class) - 'mutant_data': The DataFrame of morphometric measurements (MUTANT ONLY)
             (Int) - 'N': The fixed number of ultra-structure features the PCA axes can be constructed from
+            (Int or None) - 'max_workers': The number of mutants fit at once, None for one per core and 1 for one after the other
         Outputs:
             (None)
     """
     print('*** MUTANT ANALYSIS ***')
     print('\n')
     mutant_variants = color.gen_mutants(wt_data, mutant_data)
-    for mutant in mutant_variants:
+    for mutant, result in zip(mutant_variants, iter_analyses(mutant_variants, N, max_workers)):
         c_map = color.fill_cmap(mutant, on_index=False)
-        analyze_mutant_transition_from_scale(mutant, N, c_map)
+        analyze_mutant_transition_from_scale(mutant, N, c_map, result)
         print('\n')
 
 
-def analyze_mutant_transition_from_scale(mutant_data, n_features, c_map):
+def analyze_mutant_transition_from_scale(mutant_data, n_features, c_map, result=None):
     """ Runs the analyis on a single mutant scale. Showing what ultra-structure 
         features corespond with an exhibited scale color change in the mutant variants. 
 
@@ -449,6 +972,7 @@ def analyze_mutant_transition_from_scale(mutant_data, n_features, c_map):
             ('Pandas.DataFrame' Object Class) - 'wt_data': The DataFrame of morphometric measurements of the wilde and mutated scales of one variant 
             (Int) - 'n_features': The fixed number of ultra-structure features the PCA axes can be constructed from
             (Dictionary) - 'c_map': Dictionary Mapping Field values to the color descriptions for the Visulizations
+            (Dictionary or None) - 'result': The fits of 'analyze_segment' for this mutant, if None then they are made here
         Outputs:
             (None)
     """
@@ -456,12 +980,7 @@ def analyze_mutant_transition_from_scale(mutant_data, n_features, c_map):
     print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
     print(f'SCALE MUTATION TYPE : ', color.examine_mutant_df(mutant_data))
     print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-    # Violin Plot
-    feature_distribution(mutant_data)
-    # 2D PCA
-    Load_Features(mutant_data, c_map)
-    # Optimization
-    top_features = optimize_feature_set(
-        mutant_data, c_map, num_features=n_features)
-    show_originaldim(mutant_data, c_map, top_features)
+    if result is None:
+        result = analyze_segment(mutant_data, n_features)
+    show_segment(mutant_data, c_map, result)
     return